@@ -0,0 +1,190 @@
+# async_client.py
+"""
+    Asyncio client for services that verify messages from inside their own event loop. Nothing here reads the
+    command line or exits the process: bad arguments raise ValueError, and a server that can't be reached or doesn't
+    answer in time raises OSError or asyncio.TimeoutError once the retries are used up.
+
+        async with AsyncClient(port=9088) as client:
+            result = await client.check(b'payload', 'crc', 'crc32')
+            results = await asyncio.gather(*(client.check(data, 'parity2d', 'even') for data in messages))
+
+    or for a one-off: result = await async_client.check(b'payload', 'crc', 'crc32', port=9088)
+
+    check() protects the data with the check the same way client.py does and returns a Result with the server's
+    verdict and reply. Pass protected=True to send bits that already carry their code. check_batch() sends many
+    messages in one batch frame and returns their verdicts.
+
+    Requests are pipelined over a few kept-alive binary connections, up to pipeline of them in flight on each, and
+    matched to their replies by request id, so thousands of concurrent checks share a handful of sockets. Requests
+    beyond that wait for a slot on the least loaded connection, and the timeout only runs from when a request is
+    written. A request that times out is retried after a short backoff, and one whose connection was lost is retried
+    on a fresh connection. Verifying is idempotent, so sending a request twice is harmless.
+"""
+
+import socket
+import asyncio
+import collections
+
+import checks
+import protocol
+from bitbuffer import BitBuffer
+
+
+# the server's verdict on a message, and its reply text
+Result = collections.namedtuple('Result', 'verified reply')
+
+
+# turn data to check into a BitBuffer: bytes, a '0'/'1' string or a BitBuffer (copied, checks may append to it)
+def to_bits(data):
+    if isinstance(data, BitBuffer):
+        return data[:]
+    if isinstance(data, str):
+        return protocol.unpack_bits(*protocol.pack_bits(data))
+    return BitBuffer(data)
+
+
+# protect data with a check, raising ValueError for an unknown type or an arg the check doesn't accept
+def protect(data, error_type, error_arg):
+    return checks.get(error_type).encode(to_bits(data), error_arg)
+
+
+# a kept-alive connection with its requests in flight, each waiting on a future for its reply body
+class Connection:
+
+    def __init__(self, reader, writer, pipeline):
+        self.reader = reader
+        self.writer = writer
+        self.slots = asyncio.Semaphore(pipeline)
+        self.pending = {}
+        # requests in flight plus the ones queued for a pipeline slot, what the client balances its connections on
+        self.load = 0
+        self.last_id = 0
+        self.closed = False
+        self.reading = asyncio.ensure_future(self.read_replies())
+
+    # hand every reply that comes in to the request waiting for it, replies to abandoned requests are dropped
+    async def read_replies(self):
+        try:
+            while True:
+                header = await self.reader.readexactly(protocol.REPLY_HEADER.size)
+                magic, request_id, length = protocol.REPLY_HEADER.unpack(header)
+                if magic != protocol.MAGIC:
+                    raise protocol.ProtocolError('bad reply magic %r' % magic)
+                body = await self.reader.readexactly(length)
+                future = self.pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result(body)
+        except (OSError, asyncio.IncompleteReadError, protocol.ProtocolError) as e:
+            self.close(ConnectionError('connection to the server was lost: %s' % e))
+
+    # send the frame build(request_id) makes and wait for the reply body
+    # the timeout starts once the frame is written, time spent queued for a pipeline slot doesn't count. A request
+    # that times out is dropped on its own, the connection and the other requests on it carry on
+    async def send(self, build, timeout):
+        self.load += 1
+        try:
+            async with self.slots:
+                if self.closed:
+                    raise ConnectionError('connection to the server is closed')
+                self.last_id = (self.last_id + 1) & 0xFFFFFFFF
+                request_id = self.last_id
+                future = self.pending[request_id] = asyncio.get_running_loop().create_future()
+                try:
+                    self.writer.write(build(request_id))
+                    return await asyncio.wait_for(self.reply(future), timeout)
+                finally:
+                    self.pending.pop(request_id, None)
+        finally:
+            self.load -= 1
+
+    # wait for the frame just written to go out and its reply to come back
+    async def reply(self, future):
+        await self.writer.drain()
+        return await future
+
+    # close the connection, failing every request still waiting on it with error
+    def close(self, error=None):
+        if self.closed:
+            return
+        self.closed = True
+        error = error or ConnectionError('connection to the server was closed')
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+        self.writer.close()
+        if self.reading is not asyncio.current_task():
+            self.reading.cancel()
+
+
+# pipelined asyncio client for one server, see the module docstring
+class AsyncClient:
+
+    def __init__(self, host='localhost', port=9088, connections=4, pipeline=64, timeout=5.0, retries=2,
+                 backoff=0.1):
+        self.address = (host, port)
+        self.size = connections
+        self.pipeline = pipeline
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.connections = []
+        self.opening = asyncio.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # the least busy connection, opening another one while there are fewer than connections
+    async def connection(self):
+        self.connections = [connection for connection in self.connections if not connection.closed]
+        if len(self.connections) < self.size:
+            async with self.opening:
+                if len(self.connections) < self.size:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection(*self.address), self.timeout)
+                    # pipelined requests are small writes, don't let them wait on the ACK of the one before
+                    writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    self.connections.append(Connection(reader, writer, self.pipeline))
+        return min(self.connections, key=lambda connection: connection.load)
+
+    # send a frame built by build(request_id), retrying when it times out or its connection fails (on a fresh
+    # connection in that case), and return the reply body
+    async def request(self, build):
+        for attempt in range(self.retries + 1):
+            try:
+                connection = await self.connection()
+                return await connection.send(build, self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    # verify one message, protecting it with the check first unless protected is set
+    async def check(self, data, error_type, error_arg, protected=False):
+        bits = to_bits(data) if protected else protect(data, error_type, error_arg)
+        body = await self.request(lambda request_id: protocol.encode_request(bits, error_type, error_arg, request_id))
+        reply = body.decode('utf-8')
+        return Result(reply.startswith(checks.RECEIVED), reply)
+
+    # verify a list of (data, error type, error arg) in one batch frame, returning whether each was received correctly
+    async def check_batch(self, requests, protected=False):
+        if protected:
+            requests = [(to_bits(data), error_type, error_arg) for data, error_type, error_arg in requests]
+        else:
+            requests = [(protect(data, error_type, error_arg), error_type, error_arg)
+                        for data, error_type, error_arg in requests]
+        body = await self.request(lambda request_id: protocol.encode_batch(requests, request_id))
+        return protocol.decode_verdicts(body)
+
+    async def close(self):
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+
+
+# verify one message with a client of its own, for callers that only have the odd message to check
+async def check(data, error_type, error_arg, protected=False, **options):
+    async with AsyncClient(**options) as client:
+        return await client.check(data, error_type, error_arg, protected)
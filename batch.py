@@ -0,0 +1,93 @@
+# batch.py
+"""
+    Vectorized checks for validating many recorded messages at once with NumPy. Messages are the rows of a 2-D uint8
+    array, each byte being one 8 bit segment, and every function works on all rows in a handful of array operations
+    instead of a Python call per message.
+
+    Results match the scalar checks for a message segmented into its bytes: checks/checksum.py for checksums and
+    their verdicts, and parity_engine (behind checks/parity.py) for parity bits.
+
+    NumPy is only needed for this module: pip install numpy
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import parity_engine
+
+
+# make sure numpy is around and messages is a 2-D uint8 array, one message per row
+def as_messages(messages):
+    if np is None:
+        raise ImportError('batch mode needs numpy, install it with: pip install numpy')
+    messages = np.asarray(messages)
+    if messages.dtype != np.uint8 or messages.ndim != 2:
+        raise ValueError('messages must be a 2-D uint8 array with one message per row')
+    return messages
+
+
+# 0 for the even parity schema and 1 for odd, raising ValueError for anything else
+def schema_bit(schema):
+    return parity_engine.schema_table(schema)[0]
+
+
+# fold the carries of one's complement sums back into the low 8 bits, the array version of the wraparound
+# in the checksum check: adding the carries once per row at the end gives the same result as adding them after each segment
+def fold_carries(sums):
+    while (sums > 0xFF).any():
+        sums = (sums & 0xFF) + (sums >> 8)
+    return sums
+
+
+""" Checksum """
+
+
+# 8 bit one's complement checksum of every row
+def checksums(messages):
+    messages = as_messages(messages)
+    sums = fold_carries(messages.sum(axis=1, dtype=np.uint64))
+    return (~sums & 0xFF).astype(np.uint8)
+
+
+# server verdict for every row given the checksum that was sent with it, True where it was received correctly
+def verify_checksums(messages, received_checksums):
+    messages = as_messages(messages)
+    sums = messages.sum(axis=1, dtype=np.uint64) + np.asarray(received_checksums, dtype=np.uint64)
+    return fold_carries(sums) == 0xFF
+
+
+""" Parity """
+
+
+# parity bit of every segment of every row, an array the same shape as messages holding 0 or 1
+def parity_1d(messages, schema):
+    messages = as_messages(messages)
+    table = np.frombuffer(parity_engine.schema_table(schema), dtype=np.uint8)
+    return table[messages]
+
+
+# row parity bits (as parity_1d) and the 9 bit column parity segment of every row, first column in the top bit
+# the 9th column is the parity of the row parity bits themselves
+def parity_2d(messages, schema):
+    messages = as_messages(messages)
+    odd = schema_bit(schema)
+    row_bits = parity_1d(messages, schema)
+    columns = np.bitwise_xor.reduce(messages, axis=1).astype(np.uint16) << 1
+    columns |= np.bitwise_xor.reduce(row_bits, axis=1)
+    if odd:
+        columns ^= 0x1FF
+    return row_bits, columns
+
+
+# server verdict for every row given the parity bits sent with it, True where every segment checks out
+def verify_parity_1d(messages, received_bits, schema):
+    return (parity_1d(messages, schema) == np.asarray(received_bits)).all(axis=1)
+
+
+# server verdict for every row given the row parity bits and column parity segment sent with it
+def verify_parity_2d(messages, received_row_bits, received_columns, schema):
+    row_bits, columns = parity_2d(messages, schema)
+    rows_ok = (row_bits == np.asarray(received_row_bits)).all(axis=1)
+    return rows_ok & (columns == np.asarray(received_columns))
@@ -0,0 +1,4 @@
+# bench/__init__.py
+"""
+    Benchmarks for the error checker. Each module can be ran on its own, e.g. python -m bench.workers
+"""
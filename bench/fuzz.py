@@ -0,0 +1,142 @@
+# bench/fuzz.py
+"""
+    Round-trip fuzzer for message lengths. Run it with python -m bench.fuzz (--min-bits 1 --max-bits 4096 by default).
+
+    For every --bits value in the range and every check type, the client's error_check() protects a set of messages
+    chosen to have leading zeros (all zeros, a single 1 in the last bit, random values with their top bits cleared)
+    along with plain random ones. Each protected message must be as long as --bits says it should be, and is then sent
+    to a locally launched server, pipelined over a kept-alive session (or one connection each with --wire text), and
+    expected to be verified. Failures are printed with the size, check and message, and make the exit code 1.
+"""
+
+import os, sys, random, contextlib
+import argparse, socket
+
+import client, crc_engine, hamming_engine, protocol
+from checks import RECEIVED
+from bench.local import PORT, start_server, stop_server
+
+
+CHECKS = [
+    ('parity1d', 'even'),
+    ('parity1d', 'odd'),
+    ('parity2d', 'even'),
+    ('parity2d', 'odd'),
+    ('crc', '1011'),
+    ('crc', 'crc8'),
+    ('crc', 'crc32'),
+    ('checksum', '8'),
+    ('checksum', '16'),
+    ('checksum', '32'),
+    ('hamming', '3'),
+    ('hamming', '7'),
+    ('secded', '4'),
+]
+
+
+# function sets up the argparser arguments for the fuzzer
+def setup_argparser(parser, argv=None):
+    parser.add_argument('--min-bits', type=int, default=1, dest='min_bits',
+                        help='Usage: --min-bits <bits> smallest message size (default: %(default)s)')
+    parser.add_argument('--max-bits', type=int, default=4096, dest='max_bits',
+                        help='Usage: --max-bits <bits> largest message size (default: %(default)s)')
+    parser.add_argument('-t', '--types', nargs='+', default=sorted({t for t, a in CHECKS}),
+                        help='Usage: -t or --types <type> [<type> ...] check types to include')
+    parser.add_argument('-n', '--random', type=int, default=2,
+                        help='Usage: -n or --random <count> plain random messages per size, on top of the ones with '
+                             'leading zeros (default: %(default)s)')
+    parser.add_argument('-w', '--wire', choices=['binary', 'text'], default='binary',
+                        help='Usage: -w or --wire <format> to send the messages in (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='Usage: --seed <number> (default: %(default)s)')
+    return parser.parse_args(argv)
+
+
+# messages of num_bits bits with leading zeros, then count plain random ones
+def messages(rng, num_bits, count):
+    yield 0
+    yield 1
+    yield rng.getrandbits(num_bits) >> rng.randint(1, num_bits)
+    yield rng.getrandbits(num_bits) & ((1 << (num_bits - 1)) - 1)
+    for _ in range(count):
+        yield rng.getrandbits(num_bits)
+
+
+# how many bits the protected message of a num_bits message must have, so lost leading zeros show up
+# even when the shortened message still verifies
+def protected_length(error_type, error_arg, num_bits):
+    tail = num_bits % 8
+    rows = 9 * (num_bits // 8) + (tail + 1 if tail else 0)
+    if error_type == 'parity1d':
+        return rows
+    if error_type == 'parity2d':
+        return rows + (tail + 1 if tail else 9)
+    if error_type == 'crc':
+        return num_bits + crc_engine.crc_width(error_arg)
+    if error_type in ('hamming', 'secded'):
+        code = hamming_engine.hamming_code(error_arg, error_type == 'secded')
+        return num_bits + -(-num_bits // code.k) * (code.n - code.k)
+    return num_bits + int(error_arg)
+
+
+# send legacy text requests one connection each, returning the replies
+def text_replies(requests):
+    replies = []
+    for bits, error_type, error_arg in requests:
+        connection = socket.create_connection(('localhost', PORT))
+        try:
+            connection.sendall(protocol.encode_text_request(bits, error_type, error_arg))
+            replies.append(protocol.receive_text_reply(connection))
+        finally:
+            connection.close()
+    return replies
+
+
+# protect and send every message of every size for one check, returning the (bits, message, reply) that failed
+def fuzz_check(session, error_type, error_arg, sizes, count, rng, wire):
+    client.args = argparse.Namespace(type=[error_type, error_arg])
+    failures = []
+    for num_bits in sizes:
+        values = list(messages(rng, num_bits, count))
+        requests = [(client.error_check(value, num_bits), error_type, error_arg) for value in values]
+        replies = session.check_many(requests) if wire == 'binary' else text_replies(requests)
+        length = protected_length(error_type, error_arg, num_bits)
+        for value, request, reply in zip(values, requests, replies):
+            if len(request[0]) != length:
+                reply = 'protected message is {} bits, not {}'.format(len(request[0]), length)
+                failures.append((num_bits, value, reply))
+            elif not reply.startswith(RECEIVED):
+                failures.append((num_bits, value, reply))
+    return failures
+
+
+def main(argv=None):
+    args = setup_argparser(argparse.ArgumentParser(prog='python -m bench.fuzz'), argv)
+    if not 1 <= args.min_bits <= args.max_bits:
+        sys.exit('\nBITS ARG ERROR: need 1 <= --min-bits <= --max-bits')
+    checks = [(t, a) for t, a in CHECKS if t in args.types]
+    sizes = range(args.min_bits, args.max_bits + 1)
+    rng = random.Random(args.seed)
+
+    failed = 0
+    local_server = start_server()
+    session = client.Session(socket.create_connection(('localhost', PORT)))
+    try:
+        for error_type, error_arg in checks:
+            # the client prints every message it protects
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                failures = fuzz_check(session, error_type, error_arg, sizes, args.random, rng, args.wire)
+            print('{:<9} {:<6} bits {}-{}: {} failed'.format(error_type, error_arg, args.min_bits, args.max_bits,
+                                                           len(failures)))
+            for num_bits, value, reply in failures[:5]:
+                print('    --bits {} message {:0{}b}: {}'.format(num_bits, value, num_bits, reply[:120]))
+            failed += len(failures)
+    finally:
+        session.close()
+        stop_server(local_server)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+# bench/local.py
+"""
+    Launches a server.py on this machine for the benchmarks to talk to.
+"""
+
+import socket, subprocess, sys, os, time
+
+
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server.py')
+PORT = 9088
+
+
+# start a quiet server with the given extra options and wait until it accepts connections
+def start_server(*options):
+    server = subprocess.Popen([sys.executable, SERVER, '--quiet'] + list(options),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        if server.poll() is not None:
+            sys.exit('Server exited with code %s before accepting connections' % server.returncode)
+        try:
+            socket.create_connection(('localhost', PORT), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.05)
+    server.kill()
+    sys.exit('Server did not come up on port %s' % PORT)
+
+
+# shut the server down the same way Ctrl-C would and wait for it to exit
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
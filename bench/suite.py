@@ -0,0 +1,240 @@
+# bench/suite.py
+"""
+    Benchmark suite covering every check type, message size and transport path. Run it with python -m bench.
+
+    For each check type (parity1d, parity2d, crc with several polynomials, checksum with each word size, hamming and
+    secded) and message size it times the client's error_check() generating the code and the server's
+    process_message() verifying it.
+    It then launches a local server and measures round-trip latency, over a new connection per request and over a
+    kept-alive session, and requests per second from concurrent clients.
+
+    Results are written as JSON (-o results.json) so they can be compared between commits (--compare old.json).
+"""
+
+import os, sys, time, json, platform, subprocess, contextlib
+import argparse, threading, socket
+
+import client, server, protocol
+from metrics import percentile
+from bench.local import PORT, start_server, stop_server
+
+
+CHECKS = [
+    ('parity1d', 'even'),
+    ('parity2d', 'even'),
+    ('crc', '1011'),
+    ('crc', 'crc16-ccitt'),
+    ('crc', 'crc32'),
+    ('checksum', '8'),
+    ('checksum', '16'),
+    ('checksum', '32'),
+    ('hamming', '3'),
+    ('secded', '7'),
+]
+
+SIZES = [8, 64, 1024, 16384, 131072, 1048576, 10485760]
+ROUND_TRIP_SIZES = [64, 8192, 131072]
+
+
+# function sets up the argparser arguments for the suite
+def setup_argparser(parser, argv=None):
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=SIZES,
+                        help='Usage: -s or --sizes <bits> [<bits> ...] message sizes for the encode/verify timings')
+    parser.add_argument('-r', '--round-trip-sizes', type=int, nargs='+', default=ROUND_TRIP_SIZES,
+                        dest='round_trip_sizes', help='Usage: -r or --round-trip-sizes <bits> [<bits> ...], 0 to skip')
+    parser.add_argument('-t', '--types', nargs='+', default=sorted({t for t, a in CHECKS}),
+                        help='Usage: -t or --types <type> [<type> ...] check types to include')
+    parser.add_argument('-m', '--min-time', type=float, default=0.2, dest='min_time',
+                        help='Usage: -m or --min-time <seconds> to spend timing each case')
+    parser.add_argument('-c', '--concurrency', type=int, default=16,
+                        help='Usage: -c or --concurrency <clients> for the requests per second measurement')
+    parser.add_argument('-o', '--output', help='Usage: -o or --output <file.json> to write the results to')
+    parser.add_argument('--compare', help='Usage: --compare <file.json> earlier results to compare against')
+    return parser.parse_args(argv)
+
+
+# run fn repeatedly for at least min_time seconds and return the fastest call, in seconds
+def time_call(fn, min_time):
+    best = None
+    spent = 0.0
+    while spent < min_time or best is None:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        spent += elapsed
+    return best
+
+
+# summary statistics of a list of latencies in seconds, reported in milliseconds
+def latency_summary(latencies):
+    latencies = sorted(latencies)
+    return {
+        'mean_ms': 1000 * sum(latencies) / len(latencies),
+        'p50_ms': 1000 * percentile(latencies, 0.50),
+        'p99_ms': 1000 * percentile(latencies, 0.99),
+    }
+
+
+# make a protected message with the client's code generation, returned as the transmitted BitBuffer
+def protected_message(error_type, error_arg, bits):
+    client.args = argparse.Namespace(type=[error_type, error_arg])
+    return client.error_check(client.generate_message(bits), bits)
+
+
+""" Encode / verify """
+
+
+# time the client generating and the server verifying the error check code for every check and size
+def run_checks(checks, sizes, min_time):
+    results = []
+    for error_type, error_arg in checks:
+        for bits in sizes:
+            client.args = argparse.Namespace(type=[error_type, error_arg])
+            data = client.generate_message(bits)
+            encode = time_call(lambda: client.error_check(data, bits), min_time)
+            message = client.error_check(data, bits)
+            verify = time_call(lambda: server.process_message(message, error_type, error_arg), min_time)
+            results.append({'type': error_type, 'arg': error_arg, 'bits': bits,
+                            'encode_s': encode, 'verify_s': verify})
+            report('{:<9} {:<12} {:>9} bits  encode {:>10.6f}s  verify {:>10.6f}s'.format(
+                error_type, error_arg, bits, encode, verify))
+    return results
+
+
+""" Round trip """
+
+
+# send frames one at a time over a new connection each, returning the latencies
+def one_shot_latencies(frame, min_time):
+    latencies = []
+    while sum(latencies) < min_time or len(latencies) < 10:
+        start = time.perf_counter()
+        connection = socket.create_connection(('localhost', PORT))
+        try:
+            connection.sendall(frame)
+            protocol.receive_reply(connection)
+        finally:
+            connection.close()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+# send requests one at a time over a single kept-alive session, returning the latencies
+def keep_alive_latencies(request, min_time):
+    session = client.Session(socket.create_connection(('localhost', PORT)))
+    latencies = []
+    try:
+        while sum(latencies) < min_time or len(latencies) < 10:
+            start = time.perf_counter()
+            session.check(*request)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        session.close()
+    return latencies
+
+
+# requests per second from concurrent threads sharing a connection pool
+def requests_per_second(request, concurrency, min_time):
+    pool = client.ConnectionPool(PORT, size=concurrency)
+    deadline = time.perf_counter() + min_time
+    counts = [0] * concurrency
+
+    def worker(index):
+        while time.perf_counter() < deadline:
+            pool.check(*request)
+            counts[index] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    pool.close()
+    return sum(counts) / elapsed
+
+
+# measure every transport path against a locally launched server
+def run_round_trips(checks, sizes, concurrency, min_time):
+    results = []
+    local_server = start_server()
+    try:
+        for error_type, error_arg in checks:
+            for bits in sizes:
+                request = (protected_message(error_type, error_arg, bits), error_type, error_arg)
+                one_shot = latency_summary(one_shot_latencies(protocol.encode_request(*request), min_time))
+                keep_alive = latency_summary(keep_alive_latencies(request, min_time))
+                throughput = requests_per_second(request, concurrency, min_time)
+                results.append({'type': error_type, 'arg': error_arg, 'bits': bits, 'one_shot': one_shot,
+                                'keep_alive': keep_alive, 'requests_per_s': throughput})
+                report('{:<9} {:<12} {:>9} bits  one-shot p50 {:>8.3f}ms  keep-alive p50 {:>8.3f}ms  '
+                       '{:>9.1f} req/s'.format(error_type, error_arg, bits, one_shot['p50_ms'], keep_alive['p50_ms'],
+                                               throughput))
+    finally:
+        stop_server(local_server)
+    return results
+
+
+""" Reporting """
+
+
+# progress goes to stderr, stdout is silenced while timing since the client and server print every message
+def report(line):
+    print(line, file=sys.stderr)
+
+
+# describe where the numbers came from, so results from different machines or commits aren't mixed up
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+# print how each timing moved relative to an earlier run, slower by more than threshold is flagged
+def compare(results, previous, threshold=0.10):
+    def keyed(rows, key):
+        return {(r['type'], r['arg'], r['bits']): r[key] for r in rows}
+
+    report('\nCompared to {}:'.format((previous.get('environment') or {}).get('commit')))
+    for section, key, higher_is_better in (('checks', 'encode_s', False), ('checks', 'verify_s', False),
+                                           ('round_trip', 'requests_per_s', True)):
+        old = keyed(previous.get(section, []), key)
+        for case, value in keyed(results.get(section, []), key).items():
+            if case not in old or not old[case] or not value:
+                continue
+            change = value / old[case] - 1 if higher_is_better else old[case] / value - 1
+            flag = '  REGRESSION' if change < -threshold else ''
+            report('{:<9} {:<12} {:>9} bits  {:<15} {:>+7.1%}{}'.format(*case, key, change, flag))
+
+
+def main(argv=None):
+    args = setup_argparser(argparse.ArgumentParser(prog='python -m bench'), argv)
+    checks = [(t, a) for t, a in CHECKS if t in args.types]
+
+    results = {'environment': environment()}
+    server.verbose = False
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results['checks'] = run_checks(checks, args.sizes, args.min_time)
+        sizes = [bits for bits in args.round_trip_sizes if bits > 0]
+        results['round_trip'] = run_round_trips(checks, sizes, args.concurrency, args.min_time) if sizes else []
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+        report('\nResults written to ' + args.output)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(results, json.load(previous))
+
+
+if __name__ == '__main__':
+    main()
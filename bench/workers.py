@@ -0,0 +1,67 @@
+# bench/workers.py
+"""
+    Measures how verification throughput scales with the server's process pool (-w/--workers). A server is launched
+    for each worker count, hammered with concurrent CRC requests, and the requests per second are printed so the
+    numbers can be compared across core counts.
+"""
+
+import socket, os, time, random
+import argparse
+import concurrent.futures
+
+import protocol
+from bench.local import PORT, start_server, stop_server
+
+# CRC-32 generator polynomial, the most expensive check the server performs
+POLYNOMIAL = '100000100110000010001110110110111'
+
+
+# function sets up the argparser arguments for the benchmark
+def setup_argparser(parser):
+    parser.add_argument('-w', '--workers', type=int, nargs='+',
+                        default=sorted({0, 1, 2, os.cpu_count() or 1}),
+                        help='Usage: -w or --workers <count> [<count> ...] worker counts to compare')
+    parser.add_argument('-r', '--requests', type=int, default=400, help='Usage: -r or --requests <numberOfRequests>')
+    parser.add_argument('-c', '--concurrency', type=int, default=32, help='Usage: -c or --concurrency <clients>')
+    parser.add_argument('-b', '--bits', type=int, default=100000, help='Usage: -b or --bits <numberOfBits>')
+    return parser.parse_args()
+
+
+# send one message and wait for the verdict
+def send_request(message):
+    connection = socket.create_connection(('localhost', PORT))
+    try:
+        connection.sendall(message)
+        return protocol.receive_reply(connection)
+    finally:
+        connection.close()
+
+
+# time a fixed number of requests made by a pool of concurrent clients
+def run(workers, requests, concurrency, bits):
+    data = ''.join(random.choice('01') for _ in range(bits))
+    message = protocol.encode_request(data, 'crc', POLYNOMIAL)
+
+    server = start_server('-w', str(workers))
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as clients:
+            start = time.perf_counter()
+            list(clients.map(send_request, [message] * requests))
+            elapsed = time.perf_counter() - start
+    finally:
+        stop_server(server)
+    return requests / elapsed
+
+
+if __name__ == '__main__':
+
+    args = setup_argparser(argparse.ArgumentParser())
+
+    print('{} CRC-32 requests of {} bits, {} concurrent clients, {} cores'.format(
+        args.requests, args.bits, args.concurrency, os.cpu_count()))
+    print('{:>8} {:>12} {:>8}'.format('workers', 'requests/s', 'speedup'))
+    baseline = None
+    for workers in args.workers:
+        throughput = run(workers, args.requests, args.concurrency, args.bits)
+        baseline = baseline or throughput
+        print('{:>8} {:>12.1f} {:>7.2f}x'.format(workers, throughput, throughput / baseline))
@@ -0,0 +1,132 @@
+# bitbuffer.py
+"""
+    Compact message representation shared by the client and server, in place of lists of '0'/'1' segment strings.
+
+    A BitBuffer holds its bits packed 8 to a byte in a bytearray, first bit in the top bit of the first byte, plus the
+    number of bits that are real. Any unused bits of the last byte are kept at zero. Memory stays at one byte per 8
+    bits of message whatever the segment size the check works in.
+
+    Appending (parity bits, a crc remainder, a checksum) fills the last partial byte and extends the bytearray in
+    place, so the bits already in the buffer are never copied. bits(start, stop) reads any run of bits as an int
+    from just the bytes that cover it, which is how segments of any size are sliced out.
+"""
+
+
+class BitBuffer:
+
+    __slots__ = ('data', 'length')
+
+    def __init__(self, data=b'', length=None):
+        self.data = bytearray(data)
+        self.length = 8 * len(self.data) if length is None else length
+
+    # buffer holding the low length bits of value
+    @classmethod
+    def from_int(cls, value, length):
+        value &= (1 << length) - 1
+        return cls((value << (-length % 8)).to_bytes((length + 7) // 8, 'big'), length)
+
+    # buffer holding a '0'/'1' string
+    @classmethod
+    def from_string(cls, bit_string):
+        return cls.from_int(int(bit_string, 2) if bit_string else 0, len(bit_string))
+
+    # buffer holding the last num_bits bits of payload, the right-aligned layout the wire format uses
+    @classmethod
+    def from_bytes(cls, payload, num_bits):
+        if num_bits > 8 * len(payload):
+            raise ValueError('%s bits do not fit in %s bytes' % (num_bits, len(payload)))
+        return cls.from_int(int.from_bytes(payload, 'big'), num_bits)
+
+    def __len__(self):
+        return self.length
+
+    # the bits as an unsigned int, first bit most significant
+    def __int__(self):
+        return int.from_bytes(self.data, 'big') >> (-self.length % 8)
+
+    # the bits as a '0'/'1' string, leading zeros included
+    def __str__(self):
+        if self.length == 0:
+            return ''
+        return '{0:0{1}b}'.format(int(self), self.length)
+
+    def __repr__(self):
+        return 'BitBuffer.from_string(%r)' % str(self)
+
+    def __eq__(self, other):
+        if not isinstance(other, BitBuffer):
+            return NotImplemented
+        return self.length == other.length and self.data == other.data
+
+    # the bits right-aligned in the fewest whole bytes, the layout the wire format uses
+    def to_bytes(self):
+        return int(self).to_bytes((self.length + 7) // 8, 'big')
+
+    # the bytes made up entirely of message bits, without copying them
+    def whole_bytes(self):
+        return memoryview(self.data)[:self.length // 8]
+
+    # bits start to stop as an int, reading only the bytes they sit in
+    def bits(self, start, stop):
+        if stop <= start:
+            return 0
+        value = int.from_bytes(self.data[start // 8:(stop + 7) // 8], 'big')
+        return (value >> (-stop % 8)) & ((1 << (stop - start)) - 1)
+
+    # a single bit as 0 or 1, or a new buffer with a copy of just the sliced bits
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            if step != 1:
+                raise ValueError('BitBuffer slices cannot have a step')
+            if start % 8 == 0:
+                copy = BitBuffer(self.data[start // 8:(stop + 7) // 8], max(stop - start, 0))
+                if copy.length % 8:
+                    copy.data[-1] &= (0xFF << (-copy.length % 8)) & 0xFF
+                return copy
+            return BitBuffer.from_int(self.bits(start, stop), max(stop - start, 0))
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('bit index out of range')
+        return (self.data[index // 8] >> (7 - index % 8)) & 1
+
+    # flip a single bit in place
+    def flip(self, index):
+        if not 0 <= index < self.length:
+            raise IndexError('bit index out of range')
+        self.data[index // 8] ^= 0x80 >> (index % 8)
+
+    # successive size bit segments as ints, the last one shorter if the bits don't divide evenly
+    def segments(self, size):
+        for start in range(0, self.length, size):
+            yield self.bits(start, min(start + size, self.length))
+
+    # add the low count bits of value to the end, in place
+    def append(self, value, count):
+        if count <= 0:
+            return
+        value &= (1 << count) - 1
+        free = -self.length % 8
+        if free:
+            # top up the last partial byte first
+            if count <= free:
+                self.data[-1] |= value << (free - count)
+                self.length += count
+                return
+            count -= free
+            self.data[-1] |= value >> count
+            value &= (1 << count) - 1
+            self.length += free
+        pad = -count % 8
+        self.data += (value << pad).to_bytes((count + pad) // 8, 'big')
+        self.length += count
+
+    # add every bit of another buffer to the end, in place
+    def extend(self, other):
+        if self.length % 8 == 0:
+            self.data += other.data
+            self.length += other.length
+        else:
+            self.append(int(other), other.length)
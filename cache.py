@@ -0,0 +1,73 @@
+# cache.py
+"""
+    Verification result cache for the server, so replayed and duplicate frames (retransmissions, mostly) are answered
+    without running their error check again. Entries are keyed by a 16 byte BLAKE2b digest of the message bits, its
+    length, the check type and argument and the wire format (binary requests get the shorter reply), and hold the reply
+    the check produced, which carries the verdict.
+
+    The cache is bounded two ways: it holds at most size entries, dropping the least recently used one to make room,
+    and with a ttl an entry older than ttl seconds is treated as missing. Hits, misses and evictions are counted for
+    the server metrics. The server only uses it when bit flipping is off, since a flipped message has to be checked.
+"""
+
+import time
+import hashlib
+import collections
+
+
+# digest identifying a message (a BitBuffer), the check run on it and whether it came in a binary frame
+def digest(message, error_type, error_arg, binary=False):
+    key = hashlib.blake2b(digest_size=16)
+    key.update(message.data)
+    key.update('{},{},{},{:d}'.format(len(message), error_type, error_arg, binary).encode('utf-8'))
+    return key.digest()
+
+
+# bounded LRU cache of replies, with an optional time to live
+class ResultCache:
+
+    def __init__(self, size, ttl=None):
+        self.size = size
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    # the cached reply for a key, or None
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored, reply = entry
+        if self.ttl is not None and time.monotonic() - stored > self.ttl:
+            del self.entries[key]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return reply
+
+    # remember the reply for a key, evicting the least recently used entries past size
+    def put(self, key, reply):
+        self.entries[key] = (time.monotonic(), reply)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def snapshot(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'max_size': self.size,
+            'ttl_s': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else None,
+        }
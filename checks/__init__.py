@@ -0,0 +1,108 @@
+# checks/__init__.py
+"""
+    The error checks shared by the client, the server and the tools, looked up by their -t type name:
+
+        parity1d  even|odd    a parity bit after every 8 bit row
+        parity2d  even|odd    row parity bits plus a final segment with the parity of every column
+        crc       polynomial  crc remainder, a binary polynomial (e.g. 1011) or a preset name (e.g. crc32)
+        checksum  8|16|32     one's complement checksum over words of that size
+        hamming   2 to 10     Hamming code with that many check bits per block, corrects a flipped bit in each block
+        secded    2 to 10     hamming plus an overall parity bit per block, which also detects two flipped bits
+
+    Each one is a Check: encode(data, arg) protects a BitBuffer of message bits the way the client sends it, and
+    verify(message, arg) checks a received BitBuffer and returns a Verdict. Both raise ValueError for an arg the check
+    doesn't accept. A Verdict holds the status that opens the server's reply, and only spells out the message bits
+    after it when a text reply asks for them (reply(spell_out=True)). That way a binary reply to a whole file never
+    builds a '0'/'1' string 8 times the size of the file.
+
+    The registry maps a type name to its Check, or to a 'module:attribute' string naming where it lives, which is
+    imported the first time the type is looked up. A one-off client run only loads the engine its check needs. New
+    codes plug in the same way, by calling register('mycode', 'mypackage.mycode:CHECK') before they are used.
+"""
+
+import importlib
+
+
+# how a reply starts when the message checked out, and when it did once flipped bits were put right
+RECEIVED = 'Message was received correctly'
+CORRECTED = RECEIVED + ' after correcting'
+
+# every check type, by -t name
+registry = {
+    'parity1d': 'checks.parity:PARITY_1D',
+    'parity2d': 'checks.parity:PARITY_2D',
+    'crc': 'checks.crc:CRC',
+    'checksum': 'checks.checksum:CHECKSUM',
+    'hamming': 'checks.hamming:HAMMING',
+    'secded': 'checks.hamming:SECDED',
+}
+
+
+# base class for the checks, subclasses fill in the name, the valid args and the two methods
+class Check:
+
+    name = None
+    valid_args = ''
+
+    # the message bits (a BitBuffer) with the check's code added, possibly the same buffer appended to
+    def encode(self, data, arg):
+        raise NotImplementedError
+
+    # the Verdict on a received message (a BitBuffer)
+    def verify(self, message, arg):
+        raise NotImplementedError
+
+    # what the client and server exit with when given an arg the check doesn't accept
+    def arg_error(self):
+        return '\nTYPE {} ARG ERROR: valid args -> {}'.format(self.name.upper(), self.valid_args)
+
+
+# add a check type, given as a Check or as a 'module:attribute' string to import when it is first looked up
+def register(name, check):
+    registry[name] = check
+
+
+# every registered type name
+def names():
+    return list(registry)
+
+
+# look up the Check for a type name, importing it if this is the first time, raising ValueError for unknown types
+def get(name):
+    check = registry.get(name)
+    if check is None:
+        raise ValueError('unknown check type %r' % name)
+    if isinstance(check, str):
+        module, _, attribute = check.partition(':')
+        check = registry[name] = getattr(importlib.import_module(module), attribute)
+    return check
+
+
+# a check's verdict on a received message: the status its reply opens with (starting with RECEIVED if the message
+# checked out), and detail, a function giving the rest of a spelled out reply, called only when a reply needs it
+class Verdict:
+
+    def __init__(self, status, detail=None):
+        self.status = status
+        self.detail = detail
+
+    @property
+    def verified(self):
+        return self.status.startswith(RECEIVED)
+
+    @property
+    def corrected(self):
+        return self.status.startswith(CORRECTED)
+
+    # the reply text, just the status or with the detail after it
+    def reply(self, spell_out=True):
+        if spell_out and self.detail is not None:
+            return '{}. {}'.format(self.status, self.detail())
+        return self.status
+
+
+# verdict for a check that recomputes the code over the received data and compares the whole message
+def compare(received_message, checked_message):
+    if received_message == checked_message:
+        return Verdict(RECEIVED, lambda: "Message is " + str(checked_message))
+    return Verdict("Message receiving failed", lambda: "Messaged received is " + str(checked_message))
@@ -0,0 +1,38 @@
+# checks/checksum.py
+"""
+    One's complement checksum over 8, 16 or 32 bit words, see checksum_engine.py.
+"""
+
+import checksum_engine
+
+from checks import Check, RECEIVED, Verdict
+
+
+class ChecksumCheck(Check):
+
+    name = 'checksum'
+    valid_args = ', '.join(map(str, checksum_engine.WORD_SIZES))
+
+    # append the checksum of the message, the word size being the arg
+    def encode(self, data, arg):
+        size = checksum_engine.word_size(arg)
+        data.append(checksum_engine.checksum(checksum_engine.pack_buffer(data), size), size)
+        return data
+
+    # the last word of the message is the checksum that was sent
+    def verify(self, message, arg):
+        size = checksum_engine.word_size(arg)
+        end = max(len(message) - size, 0)
+        data = checksum_engine.pack_buffer(message[:end])
+        received_checksum = message.bits(end, len(message))
+
+        # sum the data and the received checksum, the complement of that is 0 if nothing changed along the way
+        mask = (1 << size) - 1
+        checksum = ~checksum_engine.fold(checksum_engine.ones_complement_sum(data, size) + received_checksum,
+                                         size) & mask
+        if checksum == 0:
+            return Verdict(RECEIVED, lambda: "Checksum is " + str(checksum))
+        return Verdict("Message receiving failed", lambda: "Checksum is {0:b}".format(checksum))
+
+
+CHECKSUM = ChecksumCheck()
@@ -0,0 +1,29 @@
+# checks/crc.py
+"""
+    Cyclic redundancy check, the remainder coming from the table-driven crc_engine.py.
+"""
+
+import crc_engine
+
+from checks import Check, compare
+
+
+class CRCCheck(Check):
+
+    name = 'crc'
+    valid_args = 'a binary polynomial (e.g. 1011) or one of: ' + ', '.join(crc_engine.PRESETS)
+
+    # append the remainder to the message
+    def encode(self, data, arg):
+        width = crc_engine.crc_width(arg)
+        data.append(crc_engine.crc_remainder(int(data), arg), width)
+        return data
+
+    # strip the received remainder and recompute it over the data
+    def verify(self, message, arg):
+        width = crc_engine.crc_width(arg)
+        checked_message = message[:max(len(message) - width, 0)]
+        return compare(message, self.encode(checked_message, arg))
+
+
+CRC = CRCCheck()
@@ -0,0 +1,36 @@
+# checks/hamming.py
+"""
+    Hamming forward error correction, and its SECDED variant with an overall parity bit per block, see
+    hamming_engine.py. Single bit errors in each block are corrected in the received message itself.
+"""
+
+import hamming_engine
+
+from checks import Check, CORRECTED, RECEIVED, Verdict
+
+
+class HammingCheck(Check):
+
+    valid_args = '{} to {} check bits'.format(hamming_engine.PARITY_BITS[0], hamming_engine.PARITY_BITS[-1])
+
+    # extended is the secded variant, which also notices (but can't correct) two flipped bits in a block
+    def __init__(self, name, extended=False):
+        self.name = name
+        self.extended = extended
+
+    # the arg is the number of check bits per block (3 -> Hamming(7,4))
+    def encode(self, data, arg):
+        return hamming_engine.encode(data, arg, self.extended)
+
+    def verify(self, message, arg):
+        corrected, uncorrectable = hamming_engine.correct(message, arg, self.extended)
+        if uncorrectable:
+            return Verdict("Message receiving failed. {} block(s) could not be corrected".format(uncorrectable),
+                           lambda: "Messaged received is " + str(message))
+        if corrected:
+            return Verdict("{} {} bit(s)".format(CORRECTED, corrected), lambda: "Message is " + str(message))
+        return Verdict(RECEIVED, lambda: "Message is " + str(message))
+
+
+HAMMING = HammingCheck('hamming')
+SECDED = HammingCheck('secded', extended=True)
@@ -0,0 +1,63 @@
+# checks/parity.py
+"""
+    1D and 2D parity checks over 8 bit rows, see parity_engine.py for how the rows are built.
+"""
+
+import parity_engine
+
+from checks import Check, compare
+
+
+# 1D parity check, a parity bit after every row
+class Parity1DCheck(Check):
+
+    name = 'parity1d'
+    valid_args = 'even, odd'
+
+    # add the parity bit to the end of each 8 bit row in the message
+    def encode(self, data, arg):
+        return parity_engine.parity_1d(data, arg)
+
+    def verify(self, message, arg):
+        # remove the parity bit from the end of every 9 bit row of the received message for processing
+        data = parity_engine.strip_row_parity(message)
+
+        # add the recomputed parity bit to the end of each row in the message
+        checked_message = parity_engine.parity_1d(data, arg)
+        if len(message) % 9 == 1:
+            # a lone bit after the last row is the parity bit of an empty row
+            checked_message.append(parity_engine.parity_bit(0, arg), 1)
+        return compare(message, checked_message)
+
+
+# 2D parity check, row parity bits plus a final segment of column parity bits
+class Parity2DCheck(Check):
+
+    name = 'parity2d'
+    valid_args = 'even, odd'
+
+    # add the parity bit to the end of each row, then append the segment of column parity bits
+    def encode(self, data, arg):
+        return parity_engine.parity_2d(data, arg)
+
+    def verify(self, message, arg):
+        # remove the last segment of the message, which contains the column parity information
+        # it is as wide as the shortest row: 9 bits, or when the data ends in a short row of 2 to 8 bits (data bits
+        # plus parity) the column segment is that wide too, and what the two leave over from 9 bit rows tells them
+        # apart
+        extra = len(message) % 9
+        if extra == 0:
+            width = 9
+        elif extra % 2 == 0:
+            width = extra // 2
+        else:
+            width = (extra + 9) // 2
+        rows = message[:max(len(message) - width, 0)]
+
+        # remove the parity bits from the rest of the message, then recompute them and the column parity segment
+        data = parity_engine.strip_row_parity(rows)
+        return compare(message, parity_engine.parity_2d(data, arg))
+
+
+PARITY_1D = Parity1DCheck()
+PARITY_2D = Parity2DCheck()
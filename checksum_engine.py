@@ -0,0 +1,74 @@
+# checksum_engine.py
+"""
+    One's complement checksum shared by the client and server, over 8, 16 or 32 bit words (RFC 1071 style).
+
+    The message is summed as one big-endian int: since 2^w = 1 modulo 2^w - 1, the one's complement sum of its w bit
+    words (end-around carries included) is the int modulo 2^w - 1, which Python computes in a single pass without
+    building any strings. The one exception is a non-zero message summing to a multiple of 2^w - 1, whose sum is all
+    ones (negative zero) rather than 0, exactly as adding the words one at a time would give.
+
+    update_checksum patches a checksum when part of the message changes, without re-summing the rest (RFC 1624).
+"""
+
+
+WORD_SIZES = (8, 16, 32)
+
+
+# parse a word size argument, raising ValueError for anything but 8, 16 or 32
+def word_size(arg):
+    size = int(arg)
+    if size not in WORD_SIZES:
+        raise ValueError('checksum word size must be one of %s, not %s' % (WORD_SIZES, size))
+    return size
+
+
+# pack a BitBuffer of message bits into bytes, a short final 8 bit segment becoming its own right-aligned byte
+def pack_buffer(buffer):
+    data = bytes(buffer.whole_bytes())
+    tail_length = len(buffer) % 8
+    if tail_length:
+        data += bytes([buffer.bits(len(buffer) - tail_length, len(buffer))])
+    return data
+
+
+# one's complement sum of the words of data, zero padded at the end to a whole number of words
+def ones_complement_sum(data, size=8):
+    width = size // 8
+    value = int.from_bytes(data, 'big') << (8 * (-len(data) % width))
+    return fold(value, size)
+
+
+# reduce an int to its one's complement sum of size bit words
+def fold(value, size):
+    mask = (1 << size) - 1
+    total = value % mask
+    if total == 0 and value != 0:
+        total = mask
+    return total
+
+
+# checksum of data: the one's complement of the one's complement sum of its words
+def checksum(data, size=8):
+    return ~ones_complement_sum(data, size) & ((1 << size) - 1)
+
+
+# one's complement sum of data and the checksum that was sent with it, which is all ones if nothing changed
+def verify(data, received_checksum, size=8):
+    mask = (1 << size) - 1
+    return fold(ones_complement_sum(data, size) + received_checksum, size) == mask
+
+
+# patch a checksum after the bytes at offset changed from old to new, RFC 1624 eqn. 3: HC' = ~(~HC + ~m + m')
+def update_checksum(old_checksum, offset, old, new, size=8):
+    if len(old) != len(new):
+        raise ValueError('replacement must be the same length as the bytes it replaces')
+    mask = (1 << size) - 1
+
+    # where the changed bytes sit within their words decides how they line up in the sum
+    shift = 8 * (-(offset + len(old)) % (size // 8))
+    old_sum = fold(int.from_bytes(old, 'big') << shift, size)
+    new_sum = fold(int.from_bytes(new, 'big') << shift, size)
+
+    total = fold((~old_checksum & mask) + (~old_sum & mask), size)
+    total = fold(total + new_sum, size)
+    return ~total & mask
@@ -3,20 +3,54 @@
     I'm thinking the client should be ran a single instance at a time, exiting and closing the socket after sending message and receiving validation or not
 """
 
-import socket, random
+import socket, random, os, mmap, select, time
 import sys, argparse
+import threading, queue, contextlib
+
+import checks
+import protocol
+from bitbuffer import BitBuffer
 
 
 # function sets up the argparser arguments for the program
 def setup_argparser(parser):
     # change required to true when socket connection function is project-ready
     parser.add_argument('-p', '--port', type=int, required=True, help='Usage: -p or --port <portNumber>')
-    parser.add_argument('-b', '--bits', type=int, required=True, help='Usage: -b or --bits <numberOfBits>')
+    parser.add_argument('-b', '--bits', type=int, help='Usage: -b or --bits <numberOfBits>')
     parser.add_argument('-t', '--type',
                         type=str, nargs=2, required=True,
                         help='Usage: -t or --type <typeOfErrorCheck> <option>'
                         ) # type flag accepts two arguments, the name of the error check and a schema (i.e. parity1d even)
+    parser.add_argument('-w', '--wire', choices=['auto', 'binary', 'text'], default='auto',
+                        help='Usage: -w or --wire <format>, auto asks the server if it reads the binary format and '
+                             'falls back to text')
+    parser.add_argument('-n', '--count', type=int, default=1,
+                        help='Usage: -n or --count <numberOfMessages> to pipeline over one kept-alive connection')
+    parser.add_argument('-i', '--input', type=str,
+                        help='Usage: -i or --input <file> to protect the contents of a file instead of a random '
+                             'message, with any check type but hamming and secded')
+    parser.add_argument('--batch', action='store_true',
+                        help='Usage: Include --batch to send the -n messages in a single batch request')
+    parser.add_argument('--arq', action='store_true',
+                        help='Usage: Include --arq to resend the -n messages until the server ACKs them')
+    parser.add_argument('--window', type=int, default=16,
+                        help='Usage: --window <numberOfFrames> in flight in ARQ mode, at most --server-pipeline '
+                             '(default: %(default)s)')
+    parser.add_argument('--server-pipeline', type=int, default=64, dest='server_pipeline',
+                        help='Usage: --server-pipeline <numberOfRequests> the server keeps in flight per connection, '
+                             'its --pipeline (default: %(default)s)')
+    parser.add_argument('--timeout', type=float, default=1.0,
+                        help='Usage: --timeout <seconds> before an unanswered frame is resent (default: %(default)s)')
+    parser.add_argument('--max-attempts', type=int, default=8, dest='max_attempts',
+                        help='Usage: --max-attempts <count> times a frame is sent before giving up on it '
+                             '(default: %(default)s)')
     args = parser.parse_args()
+    if args.bits is None and args.input is None:
+        parser.error('one of the arguments -b/--bits -i/--input is required')
+    # the server stops reading a connection with its pipeline full, so a larger window could leave the client and
+    # server both blocked sending
+    if not 1 <= args.window <= args.server_pipeline:
+        parser.error('argument --window: must be from 1 to the server pipeline of %s' % args.server_pipeline)
     return args
 
 
@@ -28,263 +62,36 @@ def generate_message(num_bits):
 """ Error check code generation functions """
 
 
-# pass the segmented message list to the appropriate error checking function
-def error_check(message):
-
-    segmented_message = segment(message)
-
-    print(segmented_message)
-
-    # call error checking function (i.e. parity_1D) depending on argparser value
-    # these functions return the appropriate binary error code, which this function will return
-    if args.type[0] == 'parity1d':
-        error_checked_message = parity_1D(segmented_message)
+# pass the message to the error check named by the type arg, returning it as a BitBuffer with its error code added
+# the message is an int holding num_bits bits, any leading zeros among them are kept
+def error_check(message, num_bits):
 
-    elif args.type[0] == 'parity2d':
-        error_checked_message = parity_2D(segmented_message)
+    data = BitBuffer.from_int(message, num_bits)
 
-    elif args.type[0] == 'crc':
-        error_checked_message = crc(message)
-        error_checked_message = segment(int(error_checked_message, 2))
+    print(data)
 
-    elif args.type[0] == 'checksum':
-        error_checked_message = checksum(segmented_message)
-
-    else:
+    # look up the check (i.e. parity1d) depending on argparser value, only its engine gets imported
+    try:
+        check = checks.get(args.type[0])
+    except ValueError:
         # invalid arg provided: exit program with message
-        sys.exit('\nTYPE ARG ERROR: valid args -> parity1d, parity2d, crc, checksum')
-
-    return error_checked_message
-
-
-# 1D parity check
-def parity_1D(segmented_message):
-
-    # initialize a list that will contain the parity bit for each segment
-    parity_bit_list = []
-
-    # iterate through each segment
-    for index, segment in enumerate(segmented_message):
-
-        parity_count = 0
-        # iterate through the message one bit at a time, and increment the parity_count every time a 1 is encountered
-        for bit in segment:
-            if bit == '1':
-                parity_count += 1
-
-        # compute the parity bit based on the parity schema
-        if args.type[1] == 'even':
-            if parity_count % 2 == 1:  # parity_count is odd
-                parity_bit = 1
-            else:
-                parity_bit = 0
-
-        elif args.type[1] == 'odd':
-            if parity_count % 2 == 1:  # parity_count is odd
-                parity_bit = 0
-            else:
-                parity_bit = 1
-
-        else:
-            sys.exit('\nTYPE PARITY1D ARG ERROR: valid args -> even, odd')
-
-        # append the parity bit to the list at the same index
-        parity_bit_list.append(str(parity_bit))
-
-        # add the parity bit to the end of each segment in the message
-        segmented_message[index] += parity_bit_list[index]
-
-    return segmented_message
-
-
-# 2D parity check
-def parity_2D(segmented_message):
-
-    row_parity_bit_list = []
-
-    # iterate through each segment
-    for index, segment in enumerate(segmented_message):
-
-        parity_count = 0
-        # iterate through the message one bit at a time, and increment the parity_count every time a 1 is encountered
-        for bit in segment:
-            if bit == '1':
-                parity_count += 1
-
-        # compute the parity bit based on the parity schema
-        if args.type[1] == 'even':
-            if parity_count % 2 == 1:  # parity_count is odd
-                parity_bit = 1
-            else:
-                parity_bit = 0
-
-        elif args.type[1] == 'odd':
-            if parity_count % 2 == 1:  # parity_count is odd
-                parity_bit = 0
-            else:
-                parity_bit = 1
-
-        else:
-            sys.exit('\nTYPE PARITY1D ARG ERROR: valid args -> even, odd')
-
-        # append the parity bit to the list at the same index
-        row_parity_bit_list.append(str(parity_bit))
-
-        # add the parity bit to the end of each segment in the message
-        segmented_message[index] += row_parity_bit_list[index]
-
-
-    # create a list containing representations of each column of bits for the column check
-    columns = [''.join(b) for b in zip(*segmented_message)]
-
-
-    # initiallize a string to store these bits since it will just be appended to the end of the segmented message
-    column_parity_bits = ''
-
-    # perform the parity check on the columns
-    for index, segment in enumerate(columns):
-
-        parity_count = 0
-        # iterate through the message one bit at a time, and increment the parity_count every time a 1 is encountered
-        for bit in segment:
-            if bit == '1':
-                parity_count += 1
-
-        # compute the parity bit based on the parity schema
-        if args.type[1] == 'even':
-            if parity_count % 2 == 1:  # parity_count is odd
-                parity_bit = 1
-            else:
-                parity_bit = 0
-
-        elif args.type[1] == 'odd':
-            if parity_count % 2 == 1:  # parity_count is odd
-                parity_bit = 0
-            else:
-                parity_bit = 1
-
-        else:
-            sys.exit('\nTYPE PARITY1D ARG ERROR: valid args -> even, odd')
-
-        # append the parity bit to the list at the same index
-        column_parity_bits += str(parity_bit)
-
-    # append the column string to the segmented message
-    segmented_message.append(column_parity_bits)
-
-    return segmented_message
-
-
-# cyclic redundancy check
-def crc(message):
-
-    message = '{0:b}'.format(message)
+        sys.exit('\nTYPE ARG ERROR: valid args -> ' + ', '.join(checks.names()))
 
+    # the check returns the message with the appropriate binary error code added
     try:
-        divisor = int(args.type[1], 2)  # will throw a ValueError if args.type[1] is not a binary string
-
-        # add polynomial length - 1 zeros to the end of message
-        zeros = '0' * (len(args.type[1]) - 1)
-        temp_message = message + zeros
-
-        # because of how python represents binary, we can pad our divisor with trailing zeros for division
-        divisor = '{0:b}'.format(divisor)
-        divisor_padding = '0' * (len(temp_message) - len(divisor))
-        divisor += divisor_padding
-
-        # convert message and divisor to numbers for XOR division
-        temp_message = int(temp_message, 2)
-        divisor = int(divisor, 2)
-
-        # perform the crc, using the length of the message padding (zeros) as the stopping condition for dividing
-        stop_condition = False
-        remainder = ''
-        while not stop_condition:
-            # shift the divisor to shorten it to the length of the message if it has changed
-            shift_amount = len('{0:b}'.format(divisor)) - len('{0:b}'.format(temp_message))
-            if shift_amount > 0:
-                divisor = divisor >> shift_amount
-
-            temp_message = temp_message ^ divisor
-            remainder = '{0:b}'.format(temp_message)
-            if len(remainder) <= len(zeros):
-                stop_condition = True
-
-        # if the remainder has leading 0's, python automatically omits those, so we need to re-prepend them to the crc code
-        if len(remainder) < len(zeros):
-            leading_zeros = '0' * (len(zeros) - len(remainder))
-            remainder = leading_zeros + remainder
-
-        # append the remainder to the message
-        message += remainder
-        print(remainder)
-
+        return check.encode(data, args.type[1])
     except ValueError:
-        sys.exit('\nTYPE PARITY1D ERROR: Invalid arg. Supply arg with valid binary polynomial (e.g. 1011)')
-
-    return message
-
-
-# checksum using 8 bit segments
-def checksum(segmented_message):
-
-    # if the message is only one segment long, just flip it
-    if len(segmented_message) < 2:
-        checksum = ones_complement(segmented_message[0])
-    else:
-        # iterate through the message and sum the binary values together
-        sum = int(segmented_message[0], 2)
-        for i in range(1, len(segmented_message)):
-            sum += int(segmented_message[i], 2)
-
-            # deal with the wraparound bit if it exists
-            if len('{0:b}'.format(sum)) > 8:
-                sum += 1
-
-        checksum = '{0:b}'.format(sum)
-        # one's complement the sum for the checksum
-        checksum = ones_complement(checksum)
-        print(checksum)
-    segmented_message.append(checksum)
-
-    return segmented_message
-
-
-""" Message processing and printing functions """
+        sys.exit(check.arg_error())
 
-# break up the message into a list of 8 bit binary string segments for processing
-def segment(message):
-    # create a list of 8 bit segments of the message, in order
-    # we start the for loop at 2 to skip over the '0b' prefix that begins every binary string representation in python
-    segment_list = ([bin(message)[n:n + 8] for n in range(2, len(bin(message)), 8)])
-    return segment_list
 
-
-# I acknowledge the unary '~' operator, however without the ability to deal with unsigned ints in python, it doesn't
-# # function correctly for our use case
-def ones_complement(binary_string):
-
-    flipped_string = ''
-
-    for bit in binary_string:
-
-        if bit == '0':
-            flipped_bit = 1
-        else:
-            flipped_bit = 0
-
-        flipped_string += str(flipped_bit)
-
-    return flipped_string
+""" Message printing functions """
 
 
 # print the message in groupings so it is easier to read
-def print_message(segmented_message):
-    # process the message and error_code ints as binary numbers (without the 0b prefix) and convert to a string,
-    # spaced by every 8 bits
-    message = ''.join([n for n in segmented_message])
-    segmented_message = segment(int(message, 2))
-    message_string = ' '.join([n for n in segmented_message])
+def print_message(message):
+    # spell out the message bits as a string, spaced by every 8 bits
+    bits = str(message)
+    message_string = ' '.join([bits[n:n + 8] for n in range(0, len(bits), 8)])
 
     # some formatting for a nice print out of the message
     print('\n{} {}'.format(args.type[0], args.type[1]))
@@ -312,25 +119,337 @@ def server_connect(port):
     return server_connection
 
 
+# connect for a mode that needs the binary format, exiting if the server doesn't say it reads binary frames
+def binary_connect(port):
+    server_connection = server_connect(port)
+    try:
+        binary = protocol.negotiate(server_connection)
+    except OSError:
+        binary = False
+    if not binary:
+        server_connection.close()
+        sys.exit('Server does not accept the binary format, exiting...')
+    return server_connection
+
+
 # concatenate the message to be sent to the server
-# message format is: '<data>,<typeArg1>,<typeArg2>'
-def prepare_message(segmented_data):
-    data_string = ''.join([n for n in segmented_data])
-    message = '{},{},{}'.format(data_string, args.type[0], args.type[1])
-    return message
+# message format is: '<data>,<typeArg1>,<typeArg2>\n', the newline tells the server the message is complete
+def prepare_message(data):
+    return protocol.encode_text_request(data, args.type[0], args.type[1])
+
+
+# pack the message into a binary frame, see protocol.py for the layout
+def prepare_frame(data):
+    return protocol.encode_request(data, args.type[0], args.type[1])
 
 
 # send message to server
 def send_message(connection, message):
     print('Sending message...')
-    encoded = message.encode('utf-8')
-    connection.send(encoded)
+    if isinstance(message, str):
+        message = message.encode('utf-8')
+    connection.sendall(message)
+
+
+# receive server reply, reassembling it however many reads it takes to arrive
+def receive_reply(connection, binary=False):
+    if binary:
+        request_id, reply = protocol.receive_reply(connection)
+        return reply
+    return protocol.receive_text_reply(connection)
+
+
+# send the message and return the server's reply, using the binary format unless told otherwise
+# the connection opens with a hello that a legacy server answers like any text message, and only if the server says
+# it reads binary frames is the message sent as one. Otherwise it is resent in the text format on a new connection
+def exchange(data):
+    if args.wire != 'text':
+        server_connection = server_connect(int(args.port))
+        print('Connected to server...')
+        try:
+            if protocol.negotiate(server_connection):
+                send_message(server_connection, prepare_frame(data))
+                return receive_reply(server_connection, binary=True)
+        except (OSError, protocol.ProtocolError):
+            pass
+        finally:
+            server_connection.close()
+        if args.wire == 'binary':
+            sys.exit('Server did not accept the binary format, exiting...')
+        print('Server did not accept the binary format, falling back to text...')
+
+    server_connection = server_connect(int(args.port))
+    print('Connected to server...')
+    try:
+        send_message(server_connection, prepare_message(data))
+        return receive_reply(server_connection)
+    finally:
+        server_connection.close()
+
 
+""" File input """
 
-# receive server reply
-def receive_reply(connection):
-    reply = connection.recv(2048).decode('utf-8')
-    return reply
+# how much of a mapped file is fed to the check engine and packed at a time, a whole number of 8 byte groups so
+# 9 bit parity rows always fill whole bytes
+FILE_CHUNK_SIZE = 1 << 16
+
+
+# memory-map a file read-only
+def map_file(stream):
+    return mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# streaming check engine for the type args, exiting on a bad arg like the random message mode does
+# file mode is the only user of the streaming engines, so they are only imported for it. There are none for the
+# hamming codes, their blocks don't line up with the 8 bit rows the file is streamed in
+def file_encoder():
+    import streaming
+    if args.type[0] not in streaming.ENCODERS:
+        if args.type[0] in checks.names():
+            sys.exit('\nTYPE ARG ERROR: file mode does not support {}, valid args with -i -> {}'.format(
+                args.type[0], ', '.join(streaming.ENCODERS)))
+        sys.exit('\nTYPE ARG ERROR: valid args with -i -> ' + ', '.join(streaming.ENCODERS))
+    try:
+        return streaming.encoder(args.type[0], args.type[1])
+    except ValueError as e:
+        sys.exit('\nTYPE {} ARG ERROR: {}'.format(args.type[0].upper(), e))
+
+
+# send a file as a binary request frame without ever building its bit string
+# the frame header is sized from the file size up front, so the payload can go out as it is produced. When the code
+# is whole bytes (checksums, crc8/16/32) the file bytes sit aligned in the payload: one pass over the mapping gets the
+# code and socket.sendfile sends the data. Otherwise (parity rows, other crc widths) the payload is packed a chunk at
+# a time behind the bits left over from the chunk before
+def send_file(connection, stream, request_id=0):
+    data = map_file(stream)
+    coder = file_encoder()
+    parity = args.type[0] in ('parity1d', 'parity2d')
+    num_bits = len(data) * (9 if parity else 8) + coder.width
+    payload_length = (num_bits + 7) // 8
+    if payload_length > protocol.MAX_FRAME_SIZE:
+        sys.exit('\nINPUT ARG ERROR: the message would be {} bytes, the limit is {}'.format(payload_length,
+                                                                                         protocol.MAX_FRAME_SIZE))
+
+    header = '{},{}'.format(args.type[0], args.type[1]).encode('utf-8')
+    print('Sending message...')
+    connection.sendall(protocol.REQUEST_HEADER.pack(protocol.MAGIC, request_id, len(header), payload_length) + header)
+
+    # parity rows are built a parity_engine.ROW_CHUNK of bytes at a time, so that's how the file is read for them
+    if parity:
+        import parity_engine
+        chunk_size = parity_engine.ROW_CHUNK
+    else:
+        chunk_size = FILE_CHUNK_SIZE
+    view = memoryview(data)
+    chunks = (view[n:n + chunk_size] for n in range(0, len(data), chunk_size))
+    if not parity and coder.width % 8 == 0:
+        for chunk in chunks:
+            coder.update(chunk)
+        connection.sendfile(stream, 0, len(data))
+        code = coder.finalize()
+        tail = code.to_bytes(coder.width // 8, 'big')
+
+    else:
+        # bits not sent yet, starting with the zero bits that right-align the payload
+        pending, pending_bits = 0, -num_bits % 8
+        for chunk in chunks:
+            coder.update(chunk)
+            if parity:
+                pending = (pending << 9 * len(chunk)) | parity_engine.parity_rows(chunk, args.type[1])
+                pending_bits += 9 * len(chunk)
+            else:
+                pending = (pending << 8 * len(chunk)) | int.from_bytes(chunk, 'big')
+                pending_bits += 8 * len(chunk)
+            left = pending_bits % 8
+            connection.sendall((pending >> left).to_bytes(pending_bits // 8, 'big'))
+            pending, pending_bits = pending & ((1 << left) - 1), left
+        code = coder.finalize()
+        tail = ((pending << coder.width) | code).to_bytes((pending_bits + coder.width) // 8, 'big')
+
+    connection.sendall(tail + protocol.BIT_COUNT.pack(num_bits))
+    if coder.width:
+        print('{0:0{1}b}'.format(code, coder.width))
+
+
+""" Persistent connections """
+
+
+# a kept-alive connection to the server that many binary requests can be pipelined on
+# replies may come back in any order, so they are matched to their requests by id
+class Session:
+
+    # how many requests check_many keeps in flight, must not exceed the server's --pipeline
+    window = 16
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.last_id = 0
+        self.replies = {}
+        # ids of submitted batches, whose replies are verdict bitmaps rather than status text
+        self.batches = set()
+
+    # send a request without waiting for its reply, returning the id to collect the reply with
+    # the message bits can be a BitBuffer or a '0'/'1' string
+    def submit(self, bits, error_type, error_arg):
+        self.last_id = (self.last_id + 1) & 0xFFFFFFFF
+        self.connection.sendall(protocol.encode_request(bits, error_type, error_arg, self.last_id))
+        return self.last_id
+
+    # send a batch of (bits, type, arg) requests as one frame without waiting for the verdicts, returning the id to
+    # collect them with
+    def submit_batch(self, requests):
+        self.last_id = (self.last_id + 1) & 0xFFFFFFFF
+        self.connection.sendall(protocol.encode_batch(requests, self.last_id))
+        self.batches.add(self.last_id)
+        return self.last_id
+
+    # wait for the reply to a submitted request, holding on to replies for other requests that arrive first
+    # the reply to a batch is the list of whether each of its messages was received correctly
+    def result(self, request_id):
+        while request_id not in self.replies:
+            reply_id, body = protocol.receive_reply_body(self.connection)
+            if reply_id in self.batches:
+                self.batches.discard(reply_id)
+                self.replies[reply_id] = protocol.decode_verdicts(body)
+            else:
+                self.replies[reply_id] = body.decode('utf-8')
+        return self.replies.pop(request_id)
+
+    # send one request and wait for its reply
+    def check(self, bits, error_type, error_arg):
+        return self.result(self.submit(bits, error_type, error_arg))
+
+    # verify many (bits, type, arg) requests, of any mix of check types, in one round trip
+    def check_batch(self, requests):
+        return self.result(self.submit_batch(requests))
+
+    # pipeline (bits, type, arg) requests, keeping up to window of them in flight, and return the replies in order
+    def check_many(self, requests):
+        request_ids = []
+        replies = []
+        for request in requests:
+            if len(request_ids) - len(replies) >= self.window:
+                replies.append(self.result(request_ids[len(replies)]))
+            request_ids.append(self.submit(*request))
+        for request_id in request_ids[len(replies):]:
+            replies.append(self.result(request_id))
+        return replies
+
+    def close(self):
+        self.connection.close()
+
+
+# a bounded pool of sessions for multi-threaded callers, each thread borrows a session for as long as it needs it
+class ConnectionPool:
+
+    def __init__(self, port, size=8, host='localhost'):
+        self.address = (host, port)
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+
+    # borrow a session, opening a new connection if none is idle, and return it to the pool afterwards
+    # a session that raised is closed instead, since its connection may be out of step with the server
+    @contextlib.contextmanager
+    def session(self):
+        with self.slots:
+            try:
+                session = self.idle.get_nowait()
+            except queue.Empty:
+                session = Session(socket.create_connection(self.address))
+            try:
+                yield session
+            except BaseException:
+                session.close()
+                raise
+            self.idle.put(session)
+
+    # send one request on a pooled session and wait for its reply
+    def check(self, bits, error_type, error_arg):
+        with self.session() as session:
+            return session.check(bits, error_type, error_arg)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+""" Automatic retransmission """
+
+
+# reliable delivery of check-protected messages over a kept-alive connection, by selective repeat ARQ
+# up to window frames are in flight, no more than the server's pipeline, numbered by their request id, and each asks
+# the server for an ACK or NAK. A NAKed frame is resent straight away, one with no answer after timeout seconds is
+# resent too, and one that has been sent max_attempts times without an ACK is given up on
+class ARQSender:
+
+    def __init__(self, connection, window=16, timeout=1.0, max_attempts=8):
+        self.connection = connection
+        self.window = window
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.last_id = 0
+        self.transmissions = 0
+        self.naks = 0
+        self.timeouts = 0
+        self.bytes_sent = 0
+
+    # send a frame (again), entry being [message index, frame, times sent, deadline]
+    def transmit(self, entry):
+        self.connection.sendall(entry[1])
+        entry[2] += 1
+        entry[3] = time.monotonic() + self.timeout
+        self.transmissions += 1
+        self.bytes_sent += len(entry[1])
+
+    # resend a frame that was NAKed or timed out, unless it has had all its attempts
+    def retry(self, request_id, outstanding, delivered):
+        entry = outstanding[request_id]
+        if entry[2] >= self.max_attempts:
+            delivered[entry[0]] = False
+            del outstanding[request_id]
+        else:
+            self.transmit(entry)
+
+    # send every (bits, error type, error arg) message, returning whether each one was delivered, in order
+    def send_all(self, messages):
+        messages = iter(messages)
+        delivered = []
+        outstanding = {}
+        while True:
+            # top the window up with new frames
+            while len(outstanding) < self.window:
+                message = next(messages, None)
+                if message is None:
+                    break
+                self.last_id = (self.last_id + 1) & 0xFFFFFFFF
+                delivered.append(None)
+                entry = outstanding[self.last_id] = [len(delivered) - 1,
+                                                     protocol.encode_request(*message, self.last_id, ack=True), 0, 0.0]
+                self.transmit(entry)
+            if not outstanding:
+                return delivered
+
+            # wait for the next answer, or until the oldest unanswered frame times out
+            wait = min(entry[3] for entry in outstanding.values()) - time.monotonic()
+            readable, _, _ = select.select([self.connection], [], [], max(wait, 0.0))
+            if readable:
+                request_id, verdict = protocol.receive_reply(self.connection)
+                if request_id not in outstanding:
+                    # a late answer to a frame that was already resent and dealt with
+                    continue
+                if verdict == protocol.ACK:
+                    delivered[outstanding.pop(request_id)[0]] = True
+                else:
+                    self.naks += 1
+                    self.retry(request_id, outstanding, delivered)
+            else:
+                now = time.monotonic()
+                for request_id in [r for r, entry in outstanding.items() if entry[3] <= now]:
+                    self.timeouts += 1
+                    self.retry(request_id, outstanding, delivered)
 
 
 if __name__ == '__main__':
@@ -338,18 +457,101 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     args = setup_argparser(parser)
 
-    data = generate_message(args.bits)
-    segmented_data = error_check(data)
-    print_message(segmented_data)
-
-    # create socket and connect to server
-    server_connection = server_connect(int(args.port))
-    print('Connected to server...')
+    if args.input is not None:
+        # file mode: the file is mapped and sent as it is, so it needs the binary format
+        if args.wire == 'text' or args.count > 1:
+            sys.exit('\nINPUT ARG ERROR: a file is sent once, in the binary format')
+        try:
+            stream = open(args.input, 'rb')
+        except OSError as e:
+            sys.exit('\nINPUT ARG ERROR: {}'.format(e))
+
+        with stream:
+            size = os.fstat(stream.fileno()).st_size
+            if size == 0:
+                sys.exit('\nINPUT ARG ERROR: {} is empty'.format(args.input))
+            print('\n{} {}'.format(args.type[0], args.type[1]))
+            print('\nFile {} ({} bytes)'.format(args.input, size))
+            server_connection = binary_connect(int(args.port))
+            print('Connected to server...')
+            try:
+                send_file(server_connection, stream)
+                reply = receive_reply(server_connection, binary=True)
+            finally:
+                server_connection.close()
+        print(reply)
+
+    elif args.batch:
+        # batch mode: every message goes in one frame and comes back as one bitmap of verdicts
+        if args.wire == 'text':
+            sys.exit('\nBATCH ARG ERROR: batches need the binary format')
+        requests = []
+        for _ in range(args.count):
+            checked_data = error_check(generate_message(args.bits), args.bits)
+            requests.append((checked_data, args.type[0], args.type[1]))
+
+        session = Session(binary_connect(int(args.port)))
+        print('Connected to server...')
+        print('Sending a batch of {} messages...'.format(len(requests)))
+        try:
+            verdicts = session.check_batch(requests)
+        finally:
+            session.close()
+        print(''.join('1' if verdict else '0' for verdict in verdicts))
+        print('{} of {} messages were received correctly'.format(verdicts.count(True), len(verdicts)))
+
+    elif args.arq:
+        # ARQ mode: resend every message until the server ACKs it, then report the goodput
+        if args.wire == 'text':
+            sys.exit('\nARQ ARG ERROR: ARQ needs the binary format')
+        requests = []
+        for _ in range(args.count):
+            checked_data = error_check(generate_message(args.bits), args.bits)
+            requests.append((checked_data, args.type[0], args.type[1]))
+
+        sender = ARQSender(binary_connect(int(args.port)), args.window, args.timeout, args.max_attempts)
+        print('Connected to server...')
+        print('Sending {} messages...'.format(len(requests)))
+        start = time.perf_counter()
+        try:
+            delivered = sender.send_all(requests)
+        finally:
+            sender.connection.close()
+        elapsed = time.perf_counter() - start
+
+        received = delivered.count(True)
+        print('\n{} of {} messages delivered in {:.3f}s, {} given up on'.format(
+            received, len(requests), elapsed, len(requests) - received))
+        print('{} transmissions, {} NAKs, {} timeouts'.format(
+            sender.transmissions, sender.naks, sender.timeouts))
+        efficiency = received * args.bits / 8 / sender.bytes_sent if sender.bytes_sent else 0
+        print('goodput {:.3f} Mbit/s of message data, {:.1%} of the {} bytes sent'.format(
+            received * args.bits / elapsed / 1e6, efficiency, sender.bytes_sent))
+
+    elif args.count > 1:
+        # keep-alive mode: pipeline every message over a single connection
+        if args.wire == 'text':
+            sys.exit('\nCOUNT ARG ERROR: pipelining multiple messages needs the binary format')
+        requests = []
+        for _ in range(args.count):
+            checked_data = error_check(generate_message(args.bits), args.bits)
+            print_message(checked_data)
+            requests.append((checked_data, args.type[0], args.type[1]))
+
+        session = Session(binary_connect(int(args.port)))
+        print('Connected to server...')
+        print('Sending {} messages...'.format(len(requests)))
+        try:
+            for reply in session.check_many(requests):
+                print(reply)
+        finally:
+            session.close()
 
-    # prepare message to be sent to server
-    message = prepare_message(segmented_data)
+    else:
+        data = generate_message(args.bits)
+        checked_data = error_check(data, args.bits)
+        print_message(checked_data)
 
-    # send message to server and receive reply
-    send_message(server_connection, message)
-    reply = receive_reply(server_connection)
-    print(reply)
+        # send message to server and receive reply
+        reply = exchange(checked_data)
+        print(reply)
@@ -0,0 +1,97 @@
+# crc_engine.py
+"""
+    Table-driven CRC shared by the client and server. Instead of long division one bit at a time, the message is fed
+    through a 256-entry lookup table a byte at a time. Tables are built once per polynomial and kept in a bounded LRU
+    cache, so a server seeing many different polynomials doesn't grow without limit.
+
+    crc_update and crc_finish carry the register between calls, for messages fed in a chunk at a time.
+
+    The remainder is the same one the original long division produced: the message with (len(polynomial) - 1) zeros
+    appended, divided by the polynomial. Polynomials are given as binary strings (e.g. 1011) or one of the PRESETS.
+"""
+
+import functools
+
+
+# number of polynomials whose lookup tables are kept around
+CACHE_SIZE = 32
+
+# standard generator polynomials (plain, no reflection or final xor) that can be named instead of spelled out
+PRESETS = {
+    'crc8': '100000111',
+    'crc16': '11000000000000101',
+    'crc16-ccitt': '10001000000100001',
+    'crc32': '100000100110000010001110110110111',
+}
+
+
+# turn a polynomial argument into its generator int and the width of the remainder it produces
+# a binary string with leading zeros still produces len(polynomial) - 1 remainder bits, which is the same as dividing
+# by the polynomial shifted left by the number of leading zeros
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_polynomial(polynomial):
+    polynomial = PRESETS.get(polynomial.lower(), polynomial)
+    generator = int(polynomial, 2)  # will throw a ValueError if polynomial is not a binary string
+    width = len(polynomial) - 1
+    if generator == 0 or width < 1:
+        raise ValueError('polynomial must be at least 2 bits with a non-zero value')
+    generator <<= width + 1 - generator.bit_length()
+    return generator, width
+
+
+# build the byte-wise lookup table for a generator, entry n is the register after shifting byte n through it
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def crc_table(generator):
+    width = generator.bit_length() - 1
+    top_bit = 1 << (width - 1)
+    mask = (1 << width) - 1
+    table = []
+    for byte in range(256):
+        register = byte << (width - 8)
+        for _ in range(8):
+            if register & top_bit:
+                register = (register << 1) ^ generator
+            else:
+                register <<= 1
+        table.append(register & mask)
+    return tuple(table)
+
+
+# feed bytes through a crc register and return the new register, so a crc can be computed a chunk at a time
+# start with a register of 0 and get the remainder out of the last one with crc_finish
+def crc_update(register, data, polynomial):
+    generator, width = parse_polynomial(polynomial)
+
+    # the table works on whole bytes, so polynomials narrower than 8 bits are scaled up and the result scaled back
+    shift = max(0, 8 - width)
+    table = crc_table(generator << shift)
+    mask = (1 << (width + shift)) - 1
+    high = width + shift - 8
+
+    for byte in data:
+        register = ((register << 8) & mask) ^ table[((register >> high) ^ byte) & 0xFF]
+    return register
+
+
+# the crc remainder held in a register built up by crc_update
+def crc_finish(register, polynomial):
+    generator, width = parse_polynomial(polynomial)
+    return register >> max(0, 8 - width)
+
+
+# compute the crc remainder of a message (as an int) for the given polynomial
+def crc_remainder(message, polynomial):
+    # leading zeros don't change the remainder, so the message can be padded out to whole bytes at the front
+    data = message.to_bytes((message.bit_length() + 7) // 8, 'big')
+    return crc_finish(crc_update(0, data, polynomial), polynomial)
+
+
+# same as crc_remainder, formatted as a binary string padded to the width of the polynomial
+def crc_code(message, polynomial):
+    generator, width = parse_polynomial(polynomial)
+    return '{0:0{1}b}'.format(crc_remainder(message, polynomial), width)
+
+
+# number of remainder bits a polynomial appends to the message
+def crc_width(polynomial):
+    return parse_polynomial(polynomial)[1]
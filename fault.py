@@ -0,0 +1,99 @@
+# fault.py
+"""
+    Bit error injection for fault-injection runs. Every model flips bits in place in a bytearray (or writable
+    memoryview) holding a packed message, so nothing is copied and the cost is proportional to the number of bits
+    flipped rather than the size of the message. Bits are right-aligned in the buffer the way protocol.pack_bits
+    packs them, bit 0 being the first bit of the message.
+
+    Models, each returning the number of bits it flipped:
+        single     flip one random bit half of the time (what make_switch used to do)
+        bernoulli  flip every bit independently with probability rate
+        burst      a burst of length bits: the first and last are flipped, the ones between each with probability 1/2
+        fixed      flip exactly count distinct random bits
+
+    Pass a random.Random built from a seed to make a run reproducible.
+"""
+
+import math
+import random
+import functools
+
+
+MODELS = ('single', 'bernoulli', 'burst', 'fixed')
+
+
+# flip bit number bit of a num_bits long message packed right-aligned into buffer
+def flip_bit(buffer, num_bits, bit):
+    position = bit + len(buffer) * 8 - num_bits
+    buffer[position >> 3] ^= 0x80 >> (position & 7)
+
+
+# flip a single random bit with probability 1/2
+def single(buffer, num_bits, rng):
+    if num_bits == 0 or rng.random() >= 0.5:
+        return 0
+    flip_bit(buffer, num_bits, rng.randrange(num_bits))
+    return 1
+
+
+# flip each bit independently with probability rate, jumping straight from one flipped bit to the next
+# (the gaps between them are geometrically distributed), so low error rates cost next to nothing on long messages
+def bernoulli(buffer, num_bits, rng, rate):
+    if rate <= 0:
+        return 0
+    if rate >= 1:
+        for bit in range(num_bits):
+            flip_bit(buffer, num_bits, bit)
+        return num_bits
+    log_keep = math.log1p(-rate)
+    flipped = 0
+    bit = -1
+    while True:
+        bit += 1 + int(math.log(1.0 - rng.random()) / log_keep)
+        if bit >= num_bits:
+            return flipped
+        flip_bit(buffer, num_bits, bit)
+        flipped += 1
+
+
+# flip a burst of length bits at a random position, the usual definition of a burst error: its first and last bits
+# are in error and the bits in between may or may not be
+def burst(buffer, num_bits, rng, length):
+    length = min(length, num_bits)
+    if length <= 0:
+        return 0
+    start = rng.randrange(num_bits - length + 1)
+    flip_bit(buffer, num_bits, start)
+    flipped = 1
+    if length > 1:
+        flip_bit(buffer, num_bits, start + length - 1)
+        flipped += 1
+        middle = rng.getrandbits(length - 2) if length > 2 else 0
+        while middle:
+            low = middle & -middle
+            flip_bit(buffer, num_bits, start + low.bit_length())
+            flipped += 1
+            middle ^= low
+    return flipped
+
+
+# flip exactly count distinct random bits
+def fixed(buffer, num_bits, rng, count):
+    count = min(count, num_bits)
+    for bit in rng.sample(range(num_bits), count):
+        flip_bit(buffer, num_bits, bit)
+    return count
+
+
+# build an injector for a model, a function taking (buffer, num_bits) and returning the number of bits flipped
+def make_injector(model='single', rate=0.001, length=8, count=1, seed=None):
+    rng = random.Random(seed)
+    if model == 'single':
+        return functools.partial(single, rng=rng)
+    if model == 'bernoulli':
+        return functools.partial(bernoulli, rng=rng, rate=rate)
+    if model == 'burst':
+        return functools.partial(burst, rng=rng, length=length)
+    if model == 'fixed':
+        return functools.partial(fixed, rng=rng, count=count)
+    raise ValueError('error model must be one of %s, not %r' % (', '.join(MODELS), model))
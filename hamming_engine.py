@@ -0,0 +1,206 @@
+# hamming_engine.py
+"""
+    Hamming forward error correction shared by the client and server. -t hamming <r> corrects any single flipped bit
+    in each block of the message, -t secded <r> adds an overall parity bit to every block so that two flipped bits in
+    a block are detected instead of miscorrected (single error correction, double error detection).
+
+    The codes are systematic: a block is k = 2^r - 1 - r data bits followed by r check bits (r = 3 is Hamming(7,4),
+    r = 7 is Hamming(127,120)), then the overall parity bit for SECDED, so the data reads straight through. Data bit i
+    is given the i-th r bit column that isn't a power of two and check bit j the column 2^j. The check bits are the
+    XOR of the columns of the set data bits, so the syndrome of a received block (its check bits XORed with the ones
+    its data gives) is the column of the bit that flipped, and a 2^r entry table turns it straight into the position
+    to correct. A final block with fewer than k data bits is a shortened code, its missing data bits counting as 0.
+
+    Full blocks are encoded and checked a chunk at a time, bit-sliced: the chunk is spelled out as '0'/'1' bytes and
+    the extended slice bits[i::n] gathers bit i of every block into one int. Each check or syndrome bit of every block
+    in the chunk is then the XOR of a few big ints rather than a loop over the blocks, and only blocks whose syndrome
+    isn't zero are looked at one at a time.
+"""
+
+import functools
+import collections
+
+from bitbuffer import BitBuffer
+
+
+PARITY_BITS = range(2, 11)
+
+# roughly how many bits are spelled out as '0'/'1' bytes at a time
+CHUNK_BITS = 1 << 18
+
+# r check bits, k data bits and n bits per block on the wire, whether there is an overall parity bit, the column of
+# each data bit, the data bits each check bit covers, and the block position each syndrome points at (None for 0)
+Code = collections.namedtuple('Code', 'r k n extended columns members positions')
+
+
+# build the code for a number of check bits, raising ValueError for anything outside PARITY_BITS
+@functools.lru_cache(maxsize=None)
+def hamming_code(parity_bits, extended=False):
+    r = int(parity_bits)
+    if r not in PARITY_BITS:
+        raise ValueError('hamming check bits must be %s to %s, not %r'
+                         % (PARITY_BITS[0], PARITY_BITS[-1], parity_bits))
+    columns = [c for c in range(1, 1 << r) if c & (c - 1)]
+    k = len(columns)
+
+    members = tuple(tuple(i for i, column in enumerate(columns) if column >> j & 1) for j in range(r))
+    positions = [None] * (1 << r)
+    for i, column in enumerate(columns):
+        positions[column] = i
+    for j in range(r):
+        # check bits go out most significant first, right after the data
+        positions[1 << j] = k + r - 1 - j
+    return Code(r, k, k + r + int(extended), extended, tuple(columns), members, tuple(positions))
+
+
+# check bits of a block's data bits, data being length bits with its first bit most significant
+def check_bits(code, data, length):
+    check = 0
+    for i in range(length):
+        if data >> (length - 1 - i) & 1:
+            check ^= code.columns[i]
+    return check
+
+
+# columns of check bits for a chunk of blocks, column i holding bit i of every block as one int
+def chunk_checks(code, columns):
+    checks = []
+    for members in code.members:
+        check = 0
+        for i in members:
+            check ^= columns[i]
+        checks.append(check)
+    return checks
+
+
+# how many blocks are handled per chunk
+def chunk_blocks(code):
+    return max(1, CHUNK_BITS // code.n)
+
+
+# spell out bits start to stop of a buffer as '0'/'1' bytes
+def spell(buffer, start, stop):
+    return bytearray('{0:0{1}b}'.format(buffer.bits(start, stop), stop - start), 'ascii')
+
+
+""" Encoding """
+
+
+# protect the message bits in buffer, returning a new BitBuffer of blocks of data bits followed by their check bits
+def encode(buffer, parity_bits, extended=False):
+    code = hamming_code(parity_bits, extended)
+    r, k, n = code.r, code.k, code.n
+    blocks = len(buffer) // k
+    encoded = BitBuffer()
+
+    for start in range(0, blocks, chunk_blocks(code)):
+        count = min(chunk_blocks(code), blocks - start)
+        bits = spell(buffer, start * k, (start + count) * k)
+        out = bytearray(count * n)
+        columns = []
+        for i in range(k):
+            out[i::n] = bits[i::k]
+            columns.append(int(bits[i::k], 2))
+        checks = chunk_checks(code, columns)
+        for j, check in enumerate(checks):
+            out[k + r - 1 - j::n] = '{0:0{1}b}'.format(check, count).encode('ascii')
+        if extended:
+            overall = 0
+            for column in columns + checks:
+                overall ^= column
+            out[n - 1::n] = '{0:0{1}b}'.format(overall, count).encode('ascii')
+        encoded.append(int(out, 2), count * n)
+
+    # a shortened final block for whatever data is left over
+    length = len(buffer) - blocks * k
+    if length:
+        data = buffer.bits(blocks * k, len(buffer))
+        check = check_bits(code, data, length)
+        encoded.append(data, length)
+        encoded.append(check, r)
+        if extended:
+            encoded.append((data.bit_count() + check.bit_count()) & 1, 1)
+    return encoded
+
+
+""" Decoding """
+
+
+# where in a block of length data bits a syndrome points, or None if it points past the end of a shortened block
+def locate(code, syndrome, length):
+    position = code.positions[syndrome]
+    if position < code.k:
+        return position if position < length else None
+    return length + position - code.k
+
+
+# decide what to do with a block that has a non-zero syndrome or, for SECDED, odd overall parity
+# returns the position in the block to flip, or None if the errors can't be corrected
+def correction(code, syndrome, odd, length):
+    if not code.extended:
+        return locate(code, syndrome, length)
+    if not odd:
+        # even overall parity with a non-zero syndrome: two bits flipped
+        return None
+    if syndrome == 0:
+        # only the overall parity bit itself flipped
+        return length + code.r
+    return locate(code, syndrome, length)
+
+
+# correct single bit errors in every block of an encoded message, flipping the bits in place
+# returns how many bits were corrected and how many blocks had errors that couldn't be corrected
+def correct(message, parity_bits, extended=False):
+    code = hamming_code(parity_bits, extended)
+    r, k, n = code.r, code.k, code.n
+    blocks = len(message) // n
+    corrected = uncorrectable = 0
+
+    for start in range(0, blocks, chunk_blocks(code)):
+        count = min(chunk_blocks(code), blocks - start)
+        bits = spell(message, start * n, (start + count) * n)
+        columns = [int(bits[i::n], 2) for i in range(n)]
+        syndromes = [check ^ columns[k + r - 1 - j] for j, check in enumerate(chunk_checks(code, columns))]
+
+        flagged = 0
+        for syndrome in syndromes:
+            flagged |= syndrome
+        overall = 0
+        if code.extended:
+            for column in columns:
+                overall ^= column
+            flagged |= overall
+
+        # blocks with errors are few, so they are picked out one set bit at a time
+        while flagged:
+            low = flagged & -flagged
+            flagged ^= low
+            shift = low.bit_length() - 1
+            syndrome = 0
+            for j, bits_j in enumerate(syndromes):
+                syndrome |= (bits_j >> shift & 1) << j
+            position = correction(code, syndrome, overall >> shift & 1, k)
+            if position is None:
+                uncorrectable += 1
+            else:
+                message.flip((start + count - 1 - shift) * n + position)
+                corrected += 1
+
+    # the shortened final block, if there is one
+    start = blocks * n
+    length = len(message) - start - r - int(code.extended)
+    if len(message) > start:
+        if length <= 0:
+            return corrected, uncorrectable + 1
+        data = message.bits(start, start + length)
+        received = message.bits(start + length, start + length + r)
+        syndrome = check_bits(code, data, length) ^ received
+        odd = message.bits(start, len(message)).bit_count() & 1 if code.extended else 0
+        if syndrome or odd:
+            position = correction(code, syndrome, odd, length)
+            if position is None:
+                uncorrectable += 1
+            else:
+                message.flip(start + position)
+                corrected += 1
+    return corrected, uncorrectable
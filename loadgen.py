@@ -0,0 +1,193 @@
+# loadgen.py
+"""
+    Load generator built on the client. Instead of one random message per run, it keeps many kept-alive connections
+    busy from a thread pool (optionally across several processes) for a set duration and reports latency
+    percentiles, throughput and how many messages the server verified as received correctly.
+
+    e.g. python loadgen.py -p 9088 -b 1024 -m parity2d:even crc:crc32:2 checksum:16 -c 64 -d 10
+
+    Each -m entry is <type>:<arg>[:<weight>]. Without --rate every connection sends its next message as soon as the
+    last reply is in (closed loop). With --rate messages are sent on a fixed schedule, and latency is measured from
+    when each message was due rather than when it went out, so a stalled server can't hide its backlog.
+"""
+
+import socket, random, time, json, sys, os
+import argparse, threading, contextlib
+import multiprocessing
+
+import client
+from checks import RECEIVED
+from metrics import percentile
+
+
+# function sets up the argparser arguments for the load generator
+def setup_argparser(parser):
+    parser.add_argument('-p', '--port', type=int, required=True, help='Usage: -p or --port <portNumber>')
+    parser.add_argument('-b', '--bits', type=int, default=1024, help='Usage: -b or --bits <numberOfBits>')
+    parser.add_argument('-m', '--mix', nargs='+', default=['parity1d:even', 'parity2d:even', 'crc:1011', 'checksum:8'],
+                        help='Usage: -m or --mix <type>:<arg>[:<weight>] [...] check types to send')
+    parser.add_argument('-c', '--concurrency', type=int, default=16,
+                        help='Usage: -c or --concurrency <connections> per process')
+    parser.add_argument('-r', '--rate', type=float, default=0,
+                        help='Usage: -r or --rate <messagesPerSecond> in total, 0 sends as fast as replies come back')
+    parser.add_argument('-d', '--duration', type=float, default=10, help='Usage: -d or --duration <seconds>')
+    parser.add_argument('-P', '--processes', type=int, default=1,
+                        help='Usage: -P or --processes <count> each running --concurrency connections')
+    parser.add_argument('--one-shot', action='store_true', dest='one_shot',
+                        help='Usage: --one-shot to open a new connection for every message')
+    parser.add_argument('--messages', type=int, default=32,
+                        help='Usage: --messages <count> pregenerated per check type and cycled through')
+    parser.add_argument('-o', '--output', help='Usage: -o or --output <file.json> to write the report to')
+    return parser.parse_args()
+
+
+# parse the -m entries into a list of (type, arg) and a matching list of weights
+def parse_mix(mix):
+    checks, weights = [], []
+    for entry in mix:
+        parts = entry.split(':')
+        if len(parts) not in (2, 3):
+            sys.exit('\nMIX ARG ERROR: entries look like <type>:<arg>[:<weight>], e.g. crc:1011:2')
+        checks.append((parts[0], parts[1]))
+        weights.append(float(parts[2]) if len(parts) == 3 else 1.0)
+    return checks, weights
+
+
+# protect a batch of random messages with the client's own error check code, ready to be sent
+def generate_requests(checks, bits, count):
+    requests = {}
+    for error_type, error_arg in checks:
+        client.args = argparse.Namespace(type=[error_type, error_arg])
+        requests[(error_type, error_arg)] = [
+            (client.error_check(client.generate_message(bits), bits), error_type, error_arg) for _ in range(count)
+        ]
+    return requests
+
+
+""" Load """
+
+
+# one connection's worth of load: send until the deadline, recording (check, latency, verified) for every reply
+def connection_worker(port, requests, checks, weights, interval, start, deadline, one_shot, results, errors):
+    rng = random.Random()
+    session = None
+    due = start + rng.random() * interval  # spread the scheduled connections out over the first interval
+    sent = 0
+    while True:
+        if interval:
+            if due >= deadline:
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        elif time.perf_counter() >= deadline:
+            break
+
+        check = rng.choices(checks, weights)[0]
+        request = requests[check][sent % len(requests[check])]
+        sent += 1
+        began = due if interval else time.perf_counter()
+        try:
+            if session is None:
+                session = client.Session(socket.create_connection(('localhost', port)))
+            reply = session.check(*request)
+            if one_shot:
+                session.close()
+                session = None
+        except Exception as e:
+            errors.append(repr(e))
+            if session is not None:
+                session.close()
+                session = None
+        else:
+            results.append((check, time.perf_counter() - began, reply.startswith(RECEIVED)))
+        due += interval
+
+    if session is not None:
+        session.close()
+
+
+# run the load from this process's threads and return the raw results
+def run_process(config):
+    port, bits, checks, weights, concurrency, rate, duration, one_shot, messages = config
+    random.seed()
+    # the client prints every message it protects, which isn't wanted here
+    with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+        requests = generate_requests(checks, bits, messages)
+
+    interval = concurrency / rate if rate else 0
+    results, errors = [], []
+    start = time.perf_counter()
+    threads = [threading.Thread(target=connection_worker,
+                                args=(port, requests, checks, weights, interval, start, start + duration, one_shot,
+                                      results, errors))
+               for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors, time.perf_counter() - start
+
+
+""" Reporting """
+
+
+# summarise the combined results of every process
+def summarise(results, errors, elapsed):
+    latencies = sorted(latency for check, latency, verified in results)
+    summary = {
+        'requests': len(results),
+        'errors': len(errors),
+        'elapsed_s': elapsed,
+        'throughput_per_s': len(results) / elapsed if elapsed else 0.0,
+        'latency_ms': {name: 1000 * percentile(latencies, q)
+                       for name, q in (('p50', 0.50), ('p99', 0.99), ('p999', 0.999), ('max', 1.0))},
+        'checks': {},
+    }
+    for check, latency, verified in results:
+        counts = summary['checks'].setdefault('{} {}'.format(*check), {'verified': 0, 'failed': 0})
+        counts['verified' if verified else 'failed'] += 1
+    if errors:
+        summary['first_errors'] = errors[:5]
+    return summary
+
+
+# print the summary in a readable form
+def print_summary(summary):
+    latency = summary['latency_ms']
+    print('\n{} requests in {:.1f}s, {:.1f} requests/s, {} errors'.format(
+        summary['requests'], summary['elapsed_s'], summary['throughput_per_s'], summary['errors']))
+    print('latency p50 {:.3f}ms  p99 {:.3f}ms  p999 {:.3f}ms  max {:.3f}ms'.format(
+        latency['p50'], latency['p99'], latency['p999'], latency['max']))
+    print('\n{:<24} {:>10} {:>10}'.format('check', 'verified', 'failed'))
+    for check, counts in sorted(summary['checks'].items()):
+        print('{:<24} {:>10} {:>10}'.format(check, counts['verified'], counts['failed']))
+    for error in summary.get('first_errors', []):
+        print('error:', error)
+
+
+if __name__ == '__main__':
+
+    args = setup_argparser(argparse.ArgumentParser())
+    checks, weights = parse_mix(args.mix)
+
+    print('Sending {} to port {} for {}s from {} process(es) x {} connection(s){}...'.format(
+        ', '.join('{} {}'.format(*c) for c in checks), args.port, args.duration, args.processes, args.concurrency,
+        ' at {} messages/s'.format(args.rate) if args.rate else ''))
+
+    config = (args.port, args.bits, checks, weights, args.concurrency, args.rate / args.processes, args.duration,
+              args.one_shot, args.messages)
+    if args.processes > 1:
+        with multiprocessing.Pool(args.processes) as pool:
+            outcomes = pool.map(run_process, [config] * args.processes)
+    else:
+        outcomes = [run_process(config)]
+
+    results = [r for outcome in outcomes for r in outcome[0]]
+    errors = [e for outcome in outcomes for e in outcome[1]]
+    summary = summarise(results, errors, max(outcome[2] for outcome in outcomes))
+    print_summary(summary)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(summary, output, indent=2)
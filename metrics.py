@@ -0,0 +1,193 @@
+# metrics.py
+"""
+    Server instrumentation: per check type counters, latency histograms for the receive, verify and send phases,
+    bytes in and out, how many bits the flip option changed and how many of those messages the check caught (or, for
+    the hamming checks, corrected), and the hit rate of the result cache when there is one.
+
+    Recording is a few integer updates per message, so it stays on even under load. Histograms use power of two
+    microsecond buckets, which is plenty to read percentiles off of and never needs to store individual samples.
+    The server can dump a snapshot periodically (--metrics-interval) or serve one as JSON over HTTP (--metrics-port).
+
+    With several server processes (--processes) each one sends its snapshots to the supervisor, and combine() adds
+    them up into one, buckets and all, so the percentiles are those of every request across the processes.
+"""
+
+import time, json
+import asyncio
+
+
+BUCKETS = 32  # bucket n counts samples under 2^n microseconds, the last one anything slower
+
+# Metrics attributes that are plain counts, summed when snapshots are combined
+COUNTERS = ('bytes_in', 'bytes_out', 'connections', 'open_connections', 'dropped_connections', 'flipped_bits',
+            'flipped_messages', 'detected_messages', 'corrected_messages')
+
+# result cache counts, summed when snapshots are combined
+CACHE_COUNTERS = ('size', 'max_size', 'hits', 'misses', 'expired', 'evictions')
+
+
+# latency histogram with power of two microsecond buckets
+class Histogram:
+
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[min(int(seconds * 1e6).bit_length(), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+
+    # add in the samples of another histogram's snapshot()
+    def add_snapshot(self, snapshot):
+        for bound, count in snapshot['buckets_us'].items():
+            self.counts[int(bound).bit_length() - 1] += count
+        self.count += snapshot['count']
+        self.total += snapshot['mean_ms'] * snapshot['count'] / 1000
+
+    # upper bound of the bucket holding the sample at fraction q, in milliseconds
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return (1 << bucket) / 1000.0
+        return (1 << (BUCKETS - 1)) / 1000.0
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean_ms': 1000 * self.total / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(0.50),
+            'p99_ms': self.percentile(0.99),
+            'p999_ms': self.percentile(0.999),
+            'buckets_us': {str(1 << n): c for n, c in enumerate(self.counts) if c},
+        }
+
+
+# every counter the server keeps
+class Metrics:
+
+    def __init__(self):
+        self.started = time.time()
+        self.checks = {}
+        self.phases = {'receive': Histogram(), 'verify': Histogram(), 'send': Histogram()}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.connections = 0
+        self.open_connections = 0
+        self.dropped_connections = 0
+        self.flipped_bits = 0
+        self.flipped_messages = 0
+        self.detected_messages = 0
+        self.corrected_messages = 0
+        # the server's cache.ResultCache, when it has one
+        self.cache = None
+
+    # count one verified message, verified being the server's verdict, flipped the number of bits it changed and
+    # corrected whether the check found flipped bits and put them right
+    def record(self, error_type, verified, flipped, corrected=False):
+        counts = self.checks.get(error_type)
+        if counts is None:
+            counts = self.checks[error_type] = [0, 0]
+        counts[0 if verified else 1] += 1
+        if corrected:
+            self.corrected_messages += 1
+        if flipped:
+            self.flipped_bits += flipped
+            self.flipped_messages += 1
+            if not verified or corrected:
+                self.detected_messages += 1
+
+    def snapshot(self):
+        elapsed = time.time() - self.started
+        requests = sum(verified + failed for verified, failed in self.checks.values())
+        return {
+            'uptime_s': elapsed,
+            'requests': requests,
+            'requests_per_s': requests / elapsed if elapsed else 0.0,
+            'checks': {t: {'verified': v, 'failed': f} for t, (v, f) in sorted(self.checks.items())},
+            'phases': {name: histogram.snapshot() for name, histogram in self.phases.items()},
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'connections': self.connections,
+            'open_connections': self.open_connections,
+            'dropped_connections': self.dropped_connections,
+            'flipped_bits': self.flipped_bits,
+            'flipped_messages': self.flipped_messages,
+            'detected_messages': self.detected_messages,
+            'corrected_messages': self.corrected_messages,
+            'detection_rate': self.detected_messages / self.flipped_messages if self.flipped_messages else None,
+            'cache': self.cache.snapshot() if self.cache is not None else None,
+        }
+
+
+# value at fraction q of an already sorted list of samples, for the tools that keep every sample rather than a Histogram
+def percentile(values, q):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+# add up the snapshots of several server processes into one, as if a single server started at started had served it all
+def combine(snapshots, started):
+    combined = Metrics()
+    combined.started = started
+    caches = []
+    for snapshot in snapshots:
+        for name in COUNTERS:
+            setattr(combined, name, getattr(combined, name) + snapshot[name])
+        for error_type, counts in snapshot['checks'].items():
+            totals = combined.checks.setdefault(error_type, [0, 0])
+            totals[0] += counts['verified']
+            totals[1] += counts['failed']
+        for name, histogram in snapshot['phases'].items():
+            combined.phases[name].add_snapshot(histogram)
+        if snapshot['cache'] is not None:
+            caches.append(snapshot['cache'])
+
+    result = combined.snapshot()
+    result['processes'] = len(snapshots)
+    if caches:
+        cache = {name: sum(c[name] for c in caches) for name in CACHE_COUNTERS}
+        lookups = cache['hits'] + cache['misses']
+        cache['ttl_s'] = caches[0]['ttl_s']
+        cache['hit_rate'] = cache['hits'] / lookups if lookups else None
+        result['cache'] = cache
+    return result
+
+
+""" Exposing the metrics """
+
+
+# answer every HTTP request on the metrics port with the current snapshot as JSON
+async def serve_http(metrics, port, ip_address='localhost'):
+
+    async def handle(reader, writer):
+        try:
+            # read and ignore the request line and headers, there is only one thing to ask for
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            body = json.dumps(metrics.snapshot(), indent=2).encode('utf-8')
+            writer.write(b'HTTP/1.0 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n'
+                         % len(body) + body)
+            await writer.drain()
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, ip_address, port)
+
+
+# print a snapshot as a single JSON line every interval seconds, until cancelled
+async def dump_periodically(metrics, interval):
+    while True:
+        await asyncio.sleep(interval)
+        print(json.dumps(metrics.snapshot(), separators=(',', ':')), flush=True)
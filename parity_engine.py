@@ -0,0 +1,184 @@
+# parity_engine.py
+"""
+    Parity shared by the client and server. Messages are worked on as packed bytes rather than one '0'/'1' character
+    at a time: row parity is a 256-entry table lookup per 8-bit segment (bytes.translate does the whole message in
+    one call), and column parity is the XOR of every row, folded in halves on a single int.
+
+    parity_1d, parity_2d and strip_row_parity work on whole messages held in a BitBuffer, producing exactly what the
+    old per-character loops over segment strings did, including the short final row a message can end with. The 9 bit
+    rows are built on ints a chunk at a time: the chunk's bytes are spread out into 9 bit lanes with a few shifts and
+    masks, and every lane's parity is XOR-folded into its low bit. Stripping the parity bits gathers the lanes back.
+"""
+
+from bitbuffer import BitBuffer
+
+
+# parity bit of every byte value, for each parity schema
+EVEN_TABLE = bytes(bin(n).count('1') & 1 for n in range(256))
+ODD_TABLE = bytes(p ^ 1 for p in EVEN_TABLE)
+
+
+# look up the parity table for a schema name, raising ValueError for anything but even or odd
+def schema_table(schema):
+    if schema == 'even':
+        return EVEN_TABLE
+    if schema == 'odd':
+        return ODD_TABLE
+    raise ValueError('parity schema must be even or odd, not %r' % schema)
+
+
+# parity bit of a whole int, the odd schema's bit is set when the number of 1s is even
+def parity_bit(value, schema):
+    return schema_table(schema)[0] ^ (value.bit_count() & 1)
+
+
+# parity bit of every byte in data, one byte of 0 or 1 per row
+def row_parities(data, schema):
+    return bytes(data).translate(schema_table(schema))
+
+
+# XOR every byte of data together, by repeatedly folding the upper half of the bytes onto the lower half
+def xor_fold(data):
+    value = int.from_bytes(data, 'big')
+    lanes = len(data)
+    while lanes > 1:
+        upper = lanes // 2
+        lower = lanes - upper
+        value = (value >> (8 * lower)) ^ (value & ((1 << (8 * lower)) - 1))
+        lanes = lower
+    return value
+
+
+# column parity of data laid out as 8 bit rows, as one byte with the parity of the first column in the top bit
+def column_parity(data, schema):
+    return xor_fold(data) ^ (0xFF * schema_table(schema)[0])
+
+
+""" Bit buffer interface """
+
+
+# how many rows are spread or gathered at a time, a power of 2 for the lane masks and a multiple of 8 so every chunk
+# of 9 bit rows starts on a byte
+ROW_CHUNK = 4096
+
+
+# repeat the low period bits of pattern count times (a power of 2), by doubling
+def repeat(pattern, period, count):
+    done = 1
+    while done < count:
+        pattern |= pattern << (period * done)
+        done *= 2
+    return pattern
+
+
+# the (mask, shift) steps that spread ROW_CHUNK 8 bit lanes of an int out into 9 bit lanes, lane j moving up j bits
+# the upper half of the lanes moves up by half their count, then the upper half of each half by a quarter, and so on.
+# Before the step for groups of size lanes, each group already sits at its final start, 9 * size bits apart
+def spread_steps():
+    steps = []
+    size = ROW_CHUNK
+    while size > 1:
+        half = size // 2
+        upper = ((1 << (8 * half)) - 1) << (8 * half)
+        steps.append((repeat(upper, 9 * size, ROW_CHUNK // size), half))
+        size = half
+    return steps
+
+
+SPREAD_STEPS = spread_steps()
+
+# the low bit of every 9 bit lane, and the 8 bits above it
+LANE_LOW_BITS = repeat(1, 9, ROW_CHUNK)
+LANE_DATA_BITS = LANE_LOW_BITS * 0xFF
+
+
+# move the 8 bit lanes of value (up to ROW_CHUNK of them) into 9 bit lanes, the spare top bit of each lane 0
+def spread_lanes(value):
+    for mask, shift in SPREAD_STEPS:
+        upper = value & mask
+        value ^= upper
+        value |= upper << shift
+    return value
+
+
+# move 9 bit lanes holding 8 bit values back together, the inverse of spread_lanes
+def gather_lanes(value):
+    for mask, shift in reversed(SPREAD_STEPS):
+        upper = value & (mask << shift)
+        value ^= upper
+        value |= upper >> shift
+    return value
+
+
+# 9 bit rows of up to ROW_CHUNK data bytes, each byte followed by its parity bit, as an int
+# the XOR of bits 0 to 7 of every lane is folded into its bit 0 in three shifts
+def parity_rows(data, schema):
+    lanes = spread_lanes(int.from_bytes(data, 'big'))
+    folded = lanes ^ (lanes >> 4)
+    folded ^= folded >> 2
+    folded ^= folded >> 1
+    parities = folded & LANE_LOW_BITS
+    if schema_table(schema) is ODD_TABLE:
+        parities ^= LANE_LOW_BITS & ((1 << (9 * len(data))) - 1)
+    return (lanes << 1) | parities
+
+
+# append the parity bit to every 8 bit row of the message, a short final row getting one too
+def parity_1d(buffer, schema):
+    schema_table(schema)
+    full = len(buffer) // 8
+    rows = BitBuffer()
+    with buffer.whole_bytes() as data:
+        for start in range(0, full, ROW_CHUNK):
+            chunk = data[start:start + ROW_CHUNK]
+            rows.append(parity_rows(chunk, schema), 9 * len(chunk))
+            chunk.release()
+
+    tail_length = len(buffer) - 8 * full
+    if tail_length:
+        tail = buffer.bits(8 * full, len(buffer))
+        rows.append((tail << 1) | parity_bit(tail, schema), tail_length + 1)
+    return rows
+
+
+# append the parity bit to every row, then a final segment with the parity of every column
+# like zip() over the rows, the columns only run as long as the shortest row
+def parity_2d(buffer, schema):
+    rows = parity_1d(buffer, schema)
+    if not len(rows):
+        return rows
+
+    # 9 bit column parity of the full rows: the 8 data columns, then the column of row parity bits, whose XOR is the
+    # parity of the data columns' XOR, flipped once per row with the odd schema (both columns are even parity here,
+    # the schema is applied to them once at the end)
+    with buffer.whole_bytes() as data:
+        columns = xor_fold(data)
+        row_column = (columns.bit_count() + schema_table(schema)[0] * len(data)) & 1
+    columns = (columns << 1) | row_column
+    width = 9
+    tail_length = len(rows) % 9
+    if tail_length:
+        columns ^= rows.bits(len(rows) - tail_length, len(rows)) << (9 - tail_length)
+        width = tail_length
+    columns >>= 9 - width
+    if schema_table(schema) is ODD_TABLE:
+        columns ^= (1 << width) - 1
+
+    rows.append(columns, width)
+    return rows
+
+
+# take the parity bit off the end of every 9 bit row, leaving the data bits
+# a chunk of rows at a time has its parity bits masked off and its lanes gathered back into bytes
+def strip_row_parity(buffer):
+    count = len(buffer) // 9
+    data = BitBuffer()
+    for start in range(0, count, ROW_CHUNK):
+        rows = min(ROW_CHUNK, count - start)
+        lanes = (buffer.bits(9 * start, 9 * (start + rows)) >> 1) & LANE_DATA_BITS
+        data.append(gather_lanes(lanes), 8 * rows)
+
+    tail_length = len(buffer) - 9 * count
+    if tail_length > 1:
+        data.append(buffer.bits(9 * count, len(buffer)) >> 1, tail_length - 1)
+    return data
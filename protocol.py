@@ -0,0 +1,438 @@
+# protocol.py
+"""
+    Wire format shared by the client and server.
+
+    The legacy text format sends the message as a string of '0'/'1' characters: '<data>,<typeArg1>,<typeArg2>'. The
+    binary format packs the bits instead, so the data part is 8 times smaller and needs no splitting or parsing:
+
+        request:  magic (2 bytes) | request id (uint32) | header length (uint16) | payload length (uint32)
+                  | header: '<typeArg1>,<typeArg2>' | payload: packed bits | bit count (uint32)
+        reply:    magic (2 bytes) | request id (uint32) | reply length (uint32) | reply: utf-8 status text
+
+    Payload bits are right-aligned in the payload bytes, and the trailing bit count says how many of them are real,
+    so leading zeros survive the trip. The magic can never start a text message (those start with '0' or '1'), which
+    lets the server tell the two formats apart from the first bytes it receives.
+
+    A text message gets one reply, after which the server closes the connection. Binary connections stay open for
+    as many frames as the client wants to send, and frames can be pipelined: the server may answer them out of order,
+    each reply carrying the id of the request it answers. The status text of a binary reply is only the verdict
+    ('Message was received correctly', 'Message receiving failed', ...), it doesn't spell out the message bits back
+    the way a text reply does, so replying to a large file costs a few bytes rather than 8 times the file.
+
+    A frame whose header is '<typeArg1>,<typeArg2>,ack' asks for a bare ACK or NAK as its reply instead of the status
+    text, which is what the client's ARQ mode uses to decide what to retransmit.
+
+    A batch frame carries many messages, each protected with its own check, in one round trip. Its header lists them
+    as 'batch;<type>,<arg>,<bits>;<type>,<arg>,<bits>;...' and its payload is all their bits back to back. Instead of
+    a status text per message, the reply is the number of messages (uint32) followed by a bitmap of their verdicts,
+    the first message in the top bit of the first byte, set if it was received correctly. A message whose check type
+    or arg the server doesn't know just gets a 0 bit.
+
+    Clients don't send a binary frame until the server has said it reads them, a legacy server takes the magic for a
+    broken text message and falls over. They open with HELLO, a text message a legacy server answers like any other
+    (it ignores the fourth field), while a new server answers HELLO_REPLY and keeps the connection open for frames.
+
+    Text messages end with a newline. Frames are read straight into a buffer allocated once at the size given in
+    their header (recv_into on a memoryview), so large messages are reassembled without concatenating partial reads.
+"""
+
+import socket
+import struct
+import collections
+
+from bitbuffer import BitBuffer
+
+
+MAGIC = b'\xec\x02'  # marker byte followed by the protocol version
+
+REQUEST_HEADER = struct.Struct('!2sIHI')
+BIT_COUNT = struct.Struct('!I')
+REPLY_HEADER = struct.Struct('!2sII')
+
+# replies to frames sent with ack=True, for a message that checked out and one that didn't
+ACK = 'ACK'
+NAK = 'NAK'
+
+# text message a client opens with to find out whether the server reads binary frames, and the answer if it does
+HELLO = b'0000000000000000,checksum,8,binary\n'
+HELLO_REPLY = b'binary 2\n'
+
+# first entry of a batch frame's header
+BATCH = 'batch'
+
+# largest frame the receiving side will allocate a buffer for
+MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+# how long to wait for more of a text message that wasn't newline terminated, older clients don't send one
+TEXT_IDLE_TIMEOUT = 0.2
+TEXT_CHUNK_SIZE = 65536
+
+# a request as read off the wire: its id (None for text), (message BitBuffer, error type, error arg), HELLO, or None if
+# the client closed the connection, whether it was a binary frame, its size in bytes, the loop time its first bytes
+# arrived and how many bits were flipped on the way in, and whether it asked for an ACK/NAK reply
+# for a batch frame, batch is set, request is a list of (message BitBuffer, error type, error arg) and flipped a list of
+# how many bits were flipped in each message
+Received = collections.namedtuple('Received', 'request_id request binary size started flipped ack batch')
+
+
+# raised when received bytes are not a valid message in the expected format
+class ProtocolError(ValueError):
+    pass
+
+
+# check if received bytes start a binary frame rather than a legacy text message
+def is_binary(data):
+    return data[:len(MAGIC)] == MAGIC
+
+
+# pack a BitBuffer or a '0'/'1' string into bytes, returning the bytes and the number of bits they hold
+def pack_bits(bits):
+    if isinstance(bits, BitBuffer):
+        return bits.to_bytes(), len(bits)
+    num_bits = len(bits)
+    try:
+        value = int(bits, 2) if num_bits else 0
+    except ValueError:
+        raise ProtocolError('message is not a string of bits: %r' % bits[:64])
+    return value.to_bytes((num_bits + 7) // 8, 'big'), num_bits
+
+
+# unpack bytes produced by pack_bits into a BitBuffer of num_bits bits
+def unpack_bits(payload, num_bits):
+    if num_bits > len(payload) * 8:
+        raise ProtocolError('bit count %s does not fit in %s payload bytes' % (num_bits, len(payload)))
+    return BitBuffer.from_bytes(payload, num_bits)
+
+
+""" Binary format """
+
+
+# build a binary request frame from the message bits (a BitBuffer or '0'/'1' string) and the error check type arguments
+# with ack set the server replies with just ACK or NAK
+def encode_request(bits, error_type, error_arg, request_id=0, ack=False):
+    header = '{},{}{}'.format(error_type, error_arg, ',ack' if ack else '').encode('utf-8')
+    payload, num_bits = pack_bits(bits)
+    return (REQUEST_HEADER.pack(MAGIC, request_id, len(header), len(payload))
+            + header + payload + BIT_COUNT.pack(num_bits))
+
+
+# total size of the binary request frame whose fixed header is at the start of data
+def request_size(data):
+    magic, request_id, header_length, payload_length = REQUEST_HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ProtocolError('bad magic %r' % magic)
+    return REQUEST_HEADER.size + header_length + payload_length + BIT_COUNT.size
+
+
+# check if a binary request frame is a batch, from its header
+def is_batch(frame):
+    start = REQUEST_HEADER.size
+    return bytes(frame[start:start + len(BATCH) + 1]) == (BATCH + ';').encode('utf-8')
+
+
+# writable view of the packed message bits in a binary request frame, and how many bits it holds
+def request_payload(frame):
+    frame = memoryview(frame)
+    magic, request_id, header_length, payload_length = REQUEST_HEADER.unpack_from(frame)
+    start = REQUEST_HEADER.size + header_length
+    num_bits, = BIT_COUNT.unpack_from(frame, start + payload_length)
+    return frame[start:start + payload_length], num_bits
+
+
+# build a batch frame from a list of (message bits, error type, error arg), the bits a BitBuffer or '0'/'1' string
+def encode_batch(requests, request_id=0):
+    if not requests:
+        raise ProtocolError('a batch needs at least one message')
+    message = BitBuffer()
+    entries = [BATCH]
+    for bits, error_type, error_arg in requests:
+        if not isinstance(bits, BitBuffer):
+            bits = unpack_bits(*pack_bits(bits))
+        message.extend(bits)
+        entries.append('{},{},{}'.format(error_type, error_arg, len(bits)))
+    header = ';'.join(entries).encode('utf-8')
+    if len(header) > 0xFFFF:
+        raise ProtocolError('a batch of %s messages does not fit in one frame' % len(requests))
+    payload, num_bits = pack_bits(message)
+    return (REQUEST_HEADER.pack(MAGIC, request_id, len(header), len(payload))
+            + header + payload + BIT_COUNT.pack(num_bits))
+
+
+# split the message bits of a batch frame into its list of (message BitBuffer, error type, error arg)
+def decode_batch(header, message):
+    requests = []
+    start = 0
+    try:
+        for entry in header.split(';')[1:]:
+            error_type, error_arg, num_bits = entry.split(',')
+            stop = start + int(num_bits)
+            requests.append((message[start:stop], error_type, error_arg))
+            start = stop
+    except ValueError:
+        raise ProtocolError('bad batch header %r' % header[:64])
+    if start != len(message):
+        raise ProtocolError('batch messages add up to %s bits, the payload holds %s' % (start, len(message)))
+    return requests
+
+
+# split a binary request frame into its request id, (message BitBuffer, error type, error arg) and whether it asked for
+# an ACK/NAK reply, or for a batch frame its request id, list of requests and False
+def decode_request(frame):
+    if len(frame) < REQUEST_HEADER.size or len(frame) < request_size(frame):
+        raise ProtocolError('truncated request frame')
+    frame = memoryview(frame)
+    magic, request_id, header_length, payload_length = REQUEST_HEADER.unpack_from(frame)
+    start = REQUEST_HEADER.size
+    header = bytes(frame[start:start + header_length])
+    start += header_length
+    payload = frame[start:start + payload_length]
+    num_bits, = BIT_COUNT.unpack_from(frame, start + payload_length)
+    try:
+        header = header.decode('utf-8')
+    except ValueError:
+        raise ProtocolError('bad request header %r' % header)
+    if header.startswith(BATCH + ';'):
+        return request_id, decode_batch(header, unpack_bits(payload, num_bits)), False
+    try:
+        error_type, error_arg, *flags = header.split(',')
+    except ValueError:
+        raise ProtocolError('bad request header %r' % header)
+    if flags not in ([], ['ack']):
+        raise ProtocolError('bad request header %r' % header)
+    return request_id, (unpack_bits(payload, num_bits), error_type, error_arg), bool(flags)
+
+
+# build a binary reply frame around the server's status text
+def encode_reply(reply, request_id=0):
+    reply = reply.encode('utf-8')
+    return REPLY_HEADER.pack(MAGIC, request_id, len(reply)) + reply
+
+
+# build the reply frame to a batch, a bitmap of whether each message was received correctly
+def encode_batch_reply(verdicts, request_id=0):
+    bitmap = BitBuffer()
+    for verdict in verdicts:
+        bitmap.append(1 if verdict else 0, 1)
+    body = BIT_COUNT.pack(len(verdicts)) + bytes(bitmap.data)
+    return REPLY_HEADER.pack(MAGIC, request_id, len(body)) + body
+
+
+# whether each message of a batch was received correctly, from the body of its reply frame
+def decode_verdicts(body):
+    if len(body) < BIT_COUNT.size:
+        raise ProtocolError('truncated batch reply')
+    count, = BIT_COUNT.unpack_from(body)
+    if len(body) - BIT_COUNT.size < (count + 7) // 8:
+        raise ProtocolError('batch reply bitmap is too short for %s verdicts' % count)
+    bitmap = BitBuffer(body[BIT_COUNT.size:BIT_COUNT.size + (count + 7) // 8], count)
+    return [bitmap[n] == 1 for n in range(count)]
+
+
+# get the request id and body bytes out of a binary reply frame
+def reply_body(frame):
+    frame = memoryview(frame)
+    if len(frame) < REPLY_HEADER.size:
+        raise ProtocolError('truncated reply frame')
+    magic, request_id, length = REPLY_HEADER.unpack_from(frame)
+    if magic != MAGIC or len(frame) < REPLY_HEADER.size + length:
+        raise ProtocolError('bad reply frame')
+    return request_id, bytes(frame[REPLY_HEADER.size:REPLY_HEADER.size + length])
+
+
+# get the request id and status text out of a binary reply frame
+def decode_reply(frame):
+    request_id, body = reply_body(frame)
+    return request_id, body.decode('utf-8')
+
+
+""" Legacy text format """
+
+
+# message format is: '<data>,<typeArg1>,<typeArg2>\n'
+def encode_text_request(bits, error_type, error_arg):
+    return '{},{},{}\n'.format(bits, error_type, error_arg).encode('utf-8')
+
+
+# split a legacy text message into (message bits, error type, error arg)
+def decode_text_request(data):
+    try:
+        message, error_type, error_arg = bytes(data).decode('utf-8').rstrip('\r\n').split(',')
+    except ValueError:
+        raise ProtocolError('bad text request %r' % bytes(data[:64]))
+    return message, error_type, error_arg
+
+
+""" Receiving """
+
+
+# allocate a buffer for a frame of the given size, keeping whatever part of it has already been read
+def frame_buffer(prefix, size):
+    if size > MAX_FRAME_SIZE:
+        raise ProtocolError('frame of %s bytes is larger than the %s byte limit' % (size, MAX_FRAME_SIZE))
+    buffer = bytearray(size)
+    buffer[:len(prefix)] = prefix
+    return buffer
+
+
+# fill buffer from the socket starting at offset, reading straight into it
+def recv_into_buffer(connection, buffer, offset=0):
+    view = memoryview(buffer)
+    while offset < len(buffer):
+        received = connection.recv_into(view[offset:])
+        if received == 0:
+            raise ProtocolError('connection closed after %s of %s bytes' % (offset, len(buffer)))
+        offset += received
+    return buffer
+
+
+# read exactly size bytes from a blocking socket
+def recv_exact(connection, size):
+    return recv_into_buffer(connection, bytearray(size))
+
+
+# read a whole binary reply frame from a blocking socket and return its request id and body bytes
+def receive_reply_body(connection):
+    header = recv_exact(connection, REPLY_HEADER.size)
+    magic, request_id, length = REPLY_HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ProtocolError('bad reply magic %r' % bytes(magic))
+    return reply_body(recv_into_buffer(connection, frame_buffer(header, REPLY_HEADER.size + length), len(header)))
+
+
+# read a whole binary reply frame from a blocking socket and return its request id and status text
+def receive_reply(connection):
+    request_id, body = receive_reply_body(connection)
+    return request_id, body.decode('utf-8')
+
+
+# read a legacy text reply, which runs until the server closes the connection
+# a legacy server only closes it once the next client connects, so a reply that has gone quiet is taken to be whole
+def receive_text_reply(connection):
+    chunks = bytearray()
+    chunk = bytearray(TEXT_CHUNK_SIZE)
+    while True:
+        try:
+            received = connection.recv_into(chunk)
+        except socket.timeout:
+            received = 0
+        if received == 0:
+            return chunks.decode('utf-8')
+        chunks += memoryview(chunk)[:received]
+        connection.settimeout(TEXT_IDLE_TIMEOUT)
+
+
+# send HELLO on a new blocking connection and return whether the server answered that it reads binary frames
+# reading stops at the first byte that doesn't match, a legacy server's reply is a status text
+def negotiate(connection):
+    connection.sendall(HELLO)
+    reply = bytearray()
+    while len(reply) < len(HELLO_REPLY) and HELLO_REPLY.startswith(reply):
+        chunk = connection.recv(len(HELLO_REPLY) - len(reply))
+        if not chunk:
+            break
+        reply += chunk
+    return reply == HELLO_REPLY
+
+
+# one read from a non-blocking socket into view, of what has already arrived if there is any, otherwise waiting up
+# to timeout seconds for it (raising asyncio.TimeoutError). Pipelined frames are mostly read from data that is already
+# there, and only the reads that have to wait pay for wait_for
+async def sock_recv_into(loop, connection, view, timeout=None):
+    import asyncio
+    try:
+        return connection.recv_into(view)
+    except (BlockingIOError, InterruptedError):
+        return await asyncio.wait_for(loop.sock_recv_into(connection, view), timeout)
+
+
+# async version of recv_into_buffer for non-blocking sockets driven by an event loop
+# with a timeout, a client that sends nothing for that many seconds partway through is given up on with ProtocolError
+async def recv_into_buffer_async(loop, connection, buffer, offset=0, timeout=None):
+    import asyncio
+    view = memoryview(buffer)
+    while offset < len(buffer):
+        try:
+            received = await sock_recv_into(loop, connection, view[offset:], timeout)
+        except asyncio.TimeoutError:
+            raise ProtocolError('nothing received for %s seconds after %s of %s bytes' % (timeout, offset, len(buffer)))
+        if received == 0:
+            raise ProtocolError('connection closed after %s of %s bytes' % (offset, len(buffer)))
+        offset += received
+    return buffer
+
+
+# read the next request from a non-blocking socket, returning it as a Received
+# reads never go past the end of the current frame, so pipelined frames behind it stay in the socket for the next call
+# inject, if given, is a fault.make_injector function run over the packed message bits before they are decoded
+# idle_timeout, if given, is how long every read may wait: a connection that stays quiet that long between requests
+# counts as closed, and one that stalls that long partway through a frame raises ProtocolError. However long a whole
+# frame takes to arrive doesn't matter, so a large one on a slow link isn't cut off
+async def receive_request(loop, connection, inject=None, idle_timeout=None):
+    # only the server reads requests, and it has asyncio loaded already, clients don't pay for importing it
+    import asyncio
+    first = bytearray(len(MAGIC))
+    try:
+        received = await sock_recv_into(loop, connection, first, idle_timeout)
+    except asyncio.TimeoutError:
+        received = 0
+    if received == 0:
+        return Received(None, None, None, 0, loop.time(), 0, False, False)
+    started = loop.time()
+    # the magic can arrive split over segments, the format can't be told until both bytes are in (or the client
+    # closed its side after one)
+    while received < len(MAGIC):
+        try:
+            more = await sock_recv_into(loop, connection, memoryview(first)[received:], idle_timeout)
+        except asyncio.TimeoutError:
+            raise ProtocolError('nothing received for %s seconds after the first byte' % idle_timeout)
+        if more == 0:
+            break
+        received += more
+
+    if received == len(MAGIC) and is_binary(first):
+        # read the rest of the fixed header, then the rest of the frame into a buffer sized for it
+        header = await recv_into_buffer_async(loop, connection, frame_buffer(first, REQUEST_HEADER.size), received,
+                                              idle_timeout)
+        size = request_size(header)
+        frame = await recv_into_buffer_async(loop, connection, frame_buffer(header, size), len(header), idle_timeout)
+        if not is_batch(frame):
+            flipped = 0
+            if inject is not None:
+                flipped = inject(*request_payload(frame))
+            request_id, request, ack = decode_request(frame)
+            return Received(request_id, request, True, len(frame), started, flipped, ack, False)
+
+        # the messages of a batch each go through the error model on their own, as if they had been sent one by one
+        request_id, request, ack = decode_request(frame)
+        flipped = [0] * len(request)
+        if inject is not None:
+            for n, (message, error_type, error_arg) in enumerate(request):
+                payload, num_bits = pack_bits(message)
+                payload = bytearray(payload)
+                flipped[n] = inject(payload, num_bits)
+                request[n] = (unpack_bits(payload, num_bits), error_type, error_arg)
+        return Received(request_id, request, True, len(frame), started, flipped, False, True)
+
+    # text messages run until a newline, the client closing its side, or going quiet for a moment
+    data = first[:received]
+    chunk = bytearray(TEXT_CHUNK_SIZE)
+    while not data.endswith(b'\n'):
+        try:
+            received = await asyncio.wait_for(loop.sock_recv_into(connection, chunk), TEXT_IDLE_TIMEOUT)
+        except asyncio.TimeoutError:
+            break
+        if received == 0:
+            break
+        if len(data) + received > MAX_FRAME_SIZE:
+            raise ProtocolError('text message is larger than the %s byte limit' % MAX_FRAME_SIZE)
+        data += memoryview(chunk)[:received]
+    if data == HELLO:
+        return Received(None, HELLO, False, len(data), started, 0, False, False)
+    message, error_type, error_arg = decode_text_request(data)
+    payload, num_bits = pack_bits(message)
+    flipped = 0
+    if inject is not None:
+        payload = bytearray(payload)
+        flipped = inject(payload, num_bits)
+    return Received(None, (unpack_bits(payload, num_bits), error_type, error_arg), False, len(data), started, flipped,
+                    False, False)
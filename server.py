@@ -5,330 +5,551 @@
     own terminal window. After that all works, we can implement an argument that will enable a occasional bit flipping.
 """
 
-import socket, sys, random
+import socket, sys, json, time
 import optparse
+import asyncio, signal
+import concurrent.futures
+import multiprocessing
 
+import cache
+import checks
+import fault
+import metrics
+import protocol
+
+
+# print every message and check result as it is processed, turned off by -q/--quiet
+verbose = True
 
 # function sets up the OptionParser option for the program
 def setup_optparser(parser):
     # change required to true when socket connection function is project-ready
+    parser.add_option('-p', '--port', type='int', default=9088,
+                        help='Usage: -p or --port <portNumber> to listen on (default: %default)')
+    parser.add_option('-P', '--processes', type='int', default=1,
+                        help='Usage: -P or --processes <numberOfServerProcesses> sharing the port with SO_REUSEPORT, '
+                             'run by a supervisor that restarts any that crash (default: %default)')
+    parser.add_option('--health-timeout', type='float', default=10.0, dest='health_timeout',
+                        help='Usage: --health-timeout <seconds> a server process can go without reporting to the '
+                             'supervisor before it is restarted (default: %default)')
     parser.add_option('-f', '--flip', action='store_true',
                         help='Usage: Include -f or --flip to enable potential flipping of received message bits')
+    parser.add_option('-e', '--error-model', choices=fault.MODELS, dest='error_model',
+                        help='Usage: -e or --error-model <%s> how bits get flipped, implies --flip '
+                             '(default: single)' % '|'.join(fault.MODELS))
+    parser.add_option('--error-rate', type='float', default=0.001, dest='error_rate',
+                        help='Usage: --error-rate <probability> of each bit flipping for the bernoulli model '
+                             '(default: %default)')
+    parser.add_option('--burst-length', type='int', default=8, dest='burst_length',
+                        help='Usage: --burst-length <bits> for the burst model (default: %default)')
+    parser.add_option('--flips', type='int', default=1,
+                        help='Usage: --flips <numberOfBits> flipped per message by the fixed model (default: %default)')
+    parser.add_option('--seed', type='int',
+                        help='Usage: --seed <number> to make the flipped bits reproducible')
+    parser.add_option('-b', '--backlog', type='int', default=socket.SOMAXCONN,
+                        help='Usage: -b or --backlog <numberOfPendingConnections> (default: %default)')
+    parser.add_option('-c', '--max-connections', type='int', default=1000, dest='max_connections',
+                        help='Usage: -c or --max-connections <numberOfConcurrentConnections> (default: %default)')
+    parser.add_option('-w', '--workers', type='int', default=0,
+                        help='Usage: -w or --workers <numberOfProcesses> to verify messages in a process pool, '
+                             '0 verifies on the event loop (default: %default)')
+    parser.add_option('--pipeline', type='int', default=64,
+                        help='Usage: --pipeline <numberOfRequests> in flight per connection (default: %default)')
+    parser.add_option('--idle-timeout', type='float', default=60.0, dest='idle_timeout',
+                        help='Usage: --idle-timeout <seconds> before closing a quiet connection, or dropping one that '
+                             'stalls partway through a request (default: %default)')
+    parser.add_option('--cache-size', type='int', default=0, dest='cache_size',
+                        help='Usage: --cache-size <numberOfEntries> to remember the replies to that many recent '
+                             'messages and answer repeats from memory, ignored with --flip (default: %default)')
+    parser.add_option('--cache-ttl', type='float', dest='cache_ttl',
+                        help='Usage: --cache-ttl <seconds> a remembered reply stays valid for (default: no limit)')
+    parser.add_option('-q', '--quiet', action='store_true',
+                        help='Usage: Include -q or --quiet to stop printing every message and result')
+    parser.add_option('--metrics-port', type='int', dest='metrics_port',
+                        help='Usage: --metrics-port <portNumber> to serve the server metrics as JSON over HTTP')
+    parser.add_option('--metrics-interval', type='float', dest='metrics_interval',
+                        help='Usage: --metrics-interval <seconds> to print the server metrics periodically')
     options, args = parser.parse_args()
+    if options.error_model:
+        options.flip = True
     return options
 
 
-# function to randomly flip a bit in the message
-def make_switch(message, size):
-    message_array = [c for c in message]  # python str type cannot have individual chars replaced through indexing, conversion to a list is necessary
-    random_int = random.random()
-    bit_num = random.randint(0, size-1)
-    if random_int < 0.5:
-        if message_array[bit_num] == '1':
-            message_array[bit_num] = '0'
-            print("Bit", bit_num, "was flipped.")
-        else:
-            message_array[bit_num] = '1'
-            print("Bit", bit_num, "was flipped.")
-
-    else:
-        print("No bits were flipped.")
-
-    # convert back to string
-    message = ''.join([i for i in message_array])
-
-    return message
-
-
-# define the different error checking functions here
-def parity_1D(segmented_message, arg):
-
-    # remove the parity bits from the received message for processing
-    for i, s in enumerate(segmented_message):
-        segmented_message[i] = s[0:(len(s) - 1)]
-
-    # initialize a list that will contain the parity bit for each segment
-    parity_bit_list = []
-    # iterate through each segment
-    for index, segment in enumerate(segmented_message):
-
-        parity_count = 0
-        # iterate through the message one bit at a time, and increment the parity_count every time a 1 is encountered
-        for bit in segment:
-            if bit == '1':
-                parity_count += 1
-
-        # compute the parity bit based on the parity schema
-        if arg == 'even':
-            if parity_count % 2 == 1:  # parity_count is odd
-                parity_bit = 1
-            else:
-                parity_bit = 0
-
-        elif arg == 'odd':
-            if parity_count % 2 == 1:  # parity_count is odd
-                parity_bit = 0
-            else:
-                parity_bit = 1
-
-        else:
-            sys.exit('\nTYPE PARITY1D ARG ERROR: valid args -> even, odd')
-
-        # append the parity bit to the list at the same index
-        parity_bit_list.append(str(parity_bit))
-
-        # add the parity bit to the end of each segment in the message
-        segmented_message[index] += parity_bit_list[index]
-
-    return segmented_message
-
+""" Server loop functions """
 
-# 2D parity check
-def parity_2D(segmented_message, arg):
 
-    # remove the last segment of the message, which contains the column parity information
-    segmented_message = segmented_message[0:(len(segmented_message) - 1)]
-
-    # remove the parity bits from the rest of the message for processing
-    for i, s in enumerate(segmented_message):
-        segmented_message[i] = s[0:(len(s) - 1)]
-
-    row_parity_bit_list = []
-
-    # iterate through each segment
-    for index, segment in enumerate(segmented_message):
-
-        parity_count = 0
-        # iterate through the message one bit at a time, and increment the parity_count every time a 1 is encountered
-        for bit in segment:
-            if bit == '1':
-                parity_count += 1
-
-        # compute the parity bit based on the parity schema
-        if arg == 'even':
-            if parity_count % 2 == 1:  # parity_count is odd
-                parity_bit = 1
-            else:
-                parity_bit = 0
-
-        elif arg == 'odd':
-            if parity_count % 2 == 1:  # parity_count is odd
-                parity_bit = 0
-            else:
-                parity_bit = 1
-
-        else:
-            sys.exit('\nTYPE PARITY1D ARG ERROR: valid args -> even, odd')
-
-        # append the parity bit to the list at the same index
-        row_parity_bit_list.append(str(parity_bit))
-
-        # add the parity bit to the end of each segment in the message
-        segmented_message[index] += row_parity_bit_list[index]
-
-    # create a list containing representations of each column of bits for the column check
-    columns = [''.join(b) for b in zip(*segmented_message)]
-
-    # initialize a string to store these bits since it will just be appended to the end of the segmented message
-    column_parity_bits = ''
-
-    # perform the parity check on the columns
-    for index, segment in enumerate(columns):
-
-        parity_count = 0
-        # iterate through the message one bit at a time, and increment the parity_count every time a 1 is encountered
-        for bit in segment:
-            if bit == '1':
-                parity_count += 1
-
-        # compute the parity bit based on the parity schema
-        if arg == 'even':
-            if parity_count % 2 == 1:  # parity_count is odd
-                parity_bit = 1
-            else:
-                parity_bit = 0
-
-        elif arg == 'odd':
-            if parity_count % 2 == 1:  # parity_count is odd
-                parity_bit = 0
-            else:
-                parity_bit = 1
-
-        else:
-            sys.exit('\nTYPE PARITY1D ARG ERROR: valid args -> even, odd')
-
-        # append the parity bit to the list at the same index
-        column_parity_bits += str(parity_bit)
-
-    # append the column string to the segmented message
-    segmented_message.append(column_parity_bits)
-
-    return segmented_message
-
-
-# cyclic redundancy check
-def crc(message, arg):
+# run the received message (a BitBuffer) through the requested error check and build the reply for the client
+# any bit flipping has already happened by now, while the message was still packed (see fault.py)
+# without spell_out the reply is just the verdict's status and the message bits are never turned into a string, not
+# even for printing: binary requests can be whole files, and the client already has the bits
+def process_message(message, error_type, error_arg, spell_out=True):
+    if verbose:
+        print('{},{},{}'.format(message if spell_out else '<{} bits>'.format(len(message)), error_type, error_arg))
+    # an unknown type or a bad arg fails this one request, the server carries on serving everyone else
     try:
-        divisor = int(arg, 2)  # will throw a ValueError if args.type[1] is not a binary string
-        remove_length = divisor.bit_length()-1
-        message = message[:-remove_length]
-        # add polynomial length - 1 zeros to the end of message
-        zeros = '0' * (len(arg) - 1)
-        temp_message = message + zeros
-
-        # because of how python represents binary, we can pad our divisor with trailing zeros for division
-        divisor = '{0:b}'.format(divisor)
-        divisor_padding = '0' * (len(temp_message) - len(divisor))
-        divisor += divisor_padding
-
-        # convert message and divisor to numbers for XOR division
-        temp_message = int(temp_message, 2)
-        divisor = int(divisor, 2)
-
-        # perform the crc, using the length of the message padding (zeros) as the stopping condition for dividing
-        stop_condition = False
-        remainder = ''
-        while not stop_condition:
-            # shift the divisor to shorten it to the length of the message if it has changed
-            shift_amount = len('{0:b}'.format(divisor)) - len('{0:b}'.format(temp_message))
-            if shift_amount > 0:
-                divisor = divisor >> shift_amount
-
-            temp_message = temp_message ^ divisor
-            remainder = '{0:b}'.format(temp_message)
-            if len(remainder) <= len(zeros):
-                stop_condition = True
-
-        # if the remainder has leading 0's, python automatically omits those, so we need to re-prepend them to the crc code
-        if len(remainder) < len(zeros):
-            leading_zeros = '0' * (len(zeros) - len(remainder))
-            remainder = leading_zeros + remainder
-
-        # append the remainder to the message
-        message += remainder
-        print(remainder)
-
+        check = checks.get(error_type)
     except ValueError:
-        sys.exit('\nTYPE PARITY1D ERROR: Invalid arg. Supply arg with valid binary polynomial (e.g. 1011)')
-
-    return message
-
-
-def checksum(segmented_message):
-    # if the message is only one segment long, just flip it
-    if len(segmented_message) < 2:
-        checksum = ones_complement(segmented_message[0])
+        reply = 'Message receiving failed: TYPE ARG ERROR: valid args -> ' + ', '.join(checks.names())
     else:
-        # iterate through the message and sum the binary values together
-        sum = int(segmented_message[0], 2)
-        for i in range(1, len(segmented_message)):
-            sum += int(segmented_message[i], 2)
-
-            # deal with the wraparound bit if it exists
-            if len('{0:b}'.format(sum)) > 8:
-                sum += 1
-
-        checksum = '{0:b}'.format(sum)
-        # one's complement the sum for the checksum
-        checksum = ones_complement(checksum)
-        checksum = int(checksum, 2)
-    if checksum == 0:
-        status = "Message was received correctly. Checksum is " + str(checksum)
-        print(status)
+        try:
+            reply = check.verify(message, error_arg).reply(spell_out)
+        except ValueError:
+            reply = 'Message receiving failed: ' + check.arg_error().strip()
+    if verbose:
+        print(reply)
+    return reply
+
+
+# run every message of a batch through its own check in one go, returning (received correctly, corrected) for each
+# an entry with an unknown type or a bad arg just fails, it must never take the rest of the batch or the server down
+def process_batch(requests):
+    verdicts = []
+    for request in requests:
+        try:
+            reply = process_message(*request, False)
+        except ValueError:
+            reply = 'Message receiving failed'
+        verdicts.append((reply.startswith(checks.RECEIVED), reply.startswith(checks.CORRECTED)))
+    return verdicts
+
+
+# set up each pool worker with the parent's quiet setting
+def init_worker(print_messages):
+    global verbose
+    verbose = print_messages
+
+
+# build the bit flipping function from the options, or None when flipping is off
+def setup_injector(options):
+    if not options.flip:
+        return None
+    return fault.make_injector(options.error_model or 'single', rate=options.error_rate,
+                               length=options.burst_length, count=options.flips, seed=options.seed)
+
+
+# build the verification result cache from the options, or None when it is off
+# flipped bits are different on every pass, so a remembered reply would be wrong and the cache is never used with them
+def setup_cache(options):
+    if options.cache_size <= 0:
+        return None
+    if options.flip:
+        print('Not caching replies, bits are being flipped')
+        return None
+    print('Caching the replies to %s messages' % options.cache_size)
+    return cache.ResultCache(options.cache_size, options.cache_ttl)
+
+
+# run the error check for a received request, in the process pool if there is one, and record it in the metrics
+# with a result cache, a message seen before gets its earlier reply without being checked again
+async def verify(received, options, executor, stats, results=None):
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    reply = key = None
+    if results is not None:
+        # digest before checking, the hamming checks correct the message in place
+        key = cache.digest(*received.request, binary=received.binary)
+        reply = results.get(key)
+    if reply is None:
+        if executor is None:
+            reply = process_message(*received.request, not received.binary)
+        else:
+            reply = await loop.run_in_executor(executor, process_message, *received.request, not received.binary)
+        if results is not None:
+            results.put(key, reply)
+    stats.phases['verify'].observe(loop.time() - started)
+    stats.record(received.request[1], reply.startswith(checks.RECEIVED), received.flipped,
+                 reply.startswith(checks.CORRECTED))
+    return reply
+
+
+# run the error checks for a batch request in a single pass, in the process pool if there is one, and record each
+# message in the metrics
+# the result cache is left out, it holds whole replies and a batch only asks for the verdicts
+async def verify_batch(received, executor, stats):
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    if executor is None:
+        verdicts = process_batch(received.request)
     else:
-        status = "Message receiving failed. Checksum is {0:b}".format(checksum)
-        print(status)
-    return status
-
+        verdicts = await loop.run_in_executor(executor, process_batch, received.request)
+    stats.phases['verify'].observe(loop.time() - started)
+    for request, flipped, (verified, corrected) in zip(received.request, received.flipped, verdicts):
+        stats.record(request[1], verified, flipped, corrected)
+    return [verified for verified, corrected in verdicts]
 
-def ones_complement(binary_string):
 
-    flipped_string = ''
+# send a reply and record how long it took
+async def send_reply(conn, reply, stats):
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await loop.sock_sendall(conn, reply)
+    stats.phases['send'].observe(loop.time() - started)
+    stats.bytes_out += len(reply)
 
-    for bit in binary_string:
 
-        if bit == '0':
-            flipped_bit = 1
+# run the error check for one request and send back the framed reply, just ACK or NAK if that's what it asked for
+# a batch gets the bitmap of its verdicts
+async def answer_request(conn, received, options, executor, stats, send_lock, pipeline, results=None):
+    try:
+        if received.batch:
+            frame = protocol.encode_batch_reply(await verify_batch(received, executor, stats), received.request_id)
         else:
-            flipped_bit = 0
-
-        flipped_string += str(flipped_bit)
-
-    return flipped_string
-
-# compare the received message to the server-checked message
-# send a message to the client if the message was received correctly
+            reply = await verify(received, options, executor, stats, results)
+            if received.ack:
+                reply = protocol.ACK if reply.startswith(checks.RECEIVED) else protocol.NAK
+            frame = protocol.encode_reply(reply, received.request_id)
+        async with send_lock:
+            await send_reply(conn, frame, stats)
+    finally:
+        pipeline.release()
+
+
+# serve a single client: receive its messages, perform the error checks and send back the replies
+# a text message gets one reply before the connection is closed, binary connections are kept open and their frames
+# may be pipelined, in which case replies are sent as soon as each check finishes and matched up by request id
+async def handle_connection(conn, options, limit, stats, executor=None, inject=None, results=None):
+    loop = asyncio.get_running_loop()
+    send_lock = asyncio.Lock()
+    pipeline = asyncio.Semaphore(options.pipeline)
+    requests = set()
+    stats.connections += 1
+    stats.open_connections += 1
+    try:
+        while True:
+            # a quiet connection reads as closed, one stalled partway through a frame raises ProtocolError below
+            received = await protocol.receive_request(loop, conn, inject, options.idle_timeout)
+            if received.request is None:
+                break
+            stats.phases['receive'].observe(loop.time() - received.started)
+            stats.bytes_in += received.size
+            if inject is not None and verbose:
+                print('{} bit(s) were flipped.'.format(sum(received.flipped) if received.batch else received.flipped))
+
+            if received.request == protocol.HELLO:
+                # the client is finding out if binary frames are read here, and sends them on this connection next
+                await send_reply(conn, protocol.HELLO_REPLY, stats)
+                continue
+
+            if not received.binary:
+                reply = await verify(received, options, executor, stats, results)
+                await send_reply(conn, reply.encode('utf-8'), stats)
+                break
+
+            # stop reading once too many requests are in flight, the client then backs up on its own send buffer
+            await pipeline.acquire()
+            task = asyncio.ensure_future(answer_request(conn, received, options, executor, stats,
+                                                        send_lock, pipeline, results))
+            requests.add(task)
+            task.add_done_callback(requests.discard)
+
+        if requests:
+            await asyncio.gather(*requests)
+    except (OSError, protocol.ProtocolError) as e:
+        stats.dropped_connections += 1
+        print('Dropping connection:', e)
+    finally:
+        for task in requests:
+            task.cancel()
+        conn.close()
+        stats.open_connections -= 1
+        limit.release()
+
+
+# accept connections until asked to stop, handing each one to its own task so a slow client cannot stall the others
+async def accept_connections(server, options, limit, connections, stats, executor=None, inject=None,
+                             results=None):
+    loop = asyncio.get_running_loop()
+    while True:
+        # wait for a free slot before accepting, extra clients queue up in the listen backlog meanwhile
+        await limit.acquire()
+        try:
+            conn, addr = await loop.sock_accept(server)
+        except BaseException:
+            limit.release()
+            raise
+        conn.setblocking(False)
+        # pipelined replies are small writes, don't let them wait on the ACK of the one before
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        task = asyncio.ensure_future(handle_connection(conn, options, limit, stats, executor, inject, results))
+        connections.add(task)
+        task.add_done_callback(connections.discard)
+
+
+# send the metrics to the supervisor every HEARTBEAT_INTERVAL seconds, which also tells it this process is healthy
+# stops the server if the supervisor has gone away
+async def heartbeat(stats, pipe, stop):
+    try:
+        while True:
+            pipe.send(stats.snapshot())
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+    except OSError:
+        stop.set()
 
 
-def compare_messages(received_message, checked_message):
-    if received_message == checked_message:
-        status = "Message was received correctly. Message is " + str(checked_message)
-    else:
-        status = "Message receiving failed. Messaged received is " + str(checked_message)
-    print(status)
-    return status
+# set up the listening socket and run the event loop until SIGINT/SIGTERM, then shut down cleanly
+# under a supervisor the socket shares the port with the other server processes and pipe carries the heartbeats
+async def serve(options, ip_address='localhost', pipe=None):
+    global verbose
+    verbose = not options.quiet
+    loop = asyncio.get_running_loop()
+    port = options.port
 
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if options.processes > 1:
+        # every server process binds the port, and the kernel spreads the incoming connections across them
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    server.bind((ip_address, port))
+    server.listen(options.backlog)
+    server.setblocking(False)
+    print('Now serving on port %s' % port)
 
-# break up the message into a list of n-bit binary string segments for processing
-def segment(message, segment_size):
-    # create a list of segment_size bit segments of the message, in order
-    segment_list = ([message[n:n + segment_size] for n in range(0, len(message), segment_size)])
-    return segment_list
-
-# reassemble message segments into continuous string
-def unsegment(segmented_message):
-    message = ''.join([n for n in segmented_message])
-    return message
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # platforms without signal handler support fall back to KeyboardInterrupt
+
+    executor = None
+    if options.workers > 0:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=options.workers, initializer=init_worker,
+                                                          initargs=(verbose,))
+        print('Verifying messages with %s worker processes' % options.workers)
+
+    stats = metrics.Metrics()
+    reporters = []
+    if options.metrics_port:
+        reporters.append(await metrics.serve_http(stats, options.metrics_port, ip_address))
+        print('Serving metrics on port %s' % options.metrics_port)
+    dumper = None
+    if options.metrics_interval:
+        dumper = asyncio.ensure_future(metrics.dump_periodically(stats, options.metrics_interval))
+    heartbeats = None
+    if pipe is not None:
+        heartbeats = asyncio.ensure_future(heartbeat(stats, pipe, stop))
+
+    limit = asyncio.Semaphore(options.max_connections)
+    connections = set()
+    inject = setup_injector(options)
+    results = setup_cache(options)
+    stats.cache = results
+    acceptor = asyncio.ensure_future(accept_connections(server, options, limit, connections, stats, executor,
+                                                        inject, results))
+    try:
+        await stop.wait()
+    finally:
+        print('\nShutting down...')
+        # stop accepting, then give in-flight clients a moment to get their replies
+        acceptor.cancel()
+        await asyncio.gather(acceptor, return_exceptions=True)
+        server.close()
+        if connections:
+            done, pending = await asyncio.wait(set(connections), timeout=5)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if dumper is not None:
+            dumper.cancel()
+        for reporter in reporters:
+            reporter.close()
+        if heartbeats is not None:
+            heartbeats.cancel()
+            try:
+                # the final numbers, so the supervisor's totals include the requests answered while shutting down
+                pipe.send(stats.snapshot())
+            except OSError:
+                pass
+        if options.metrics_interval or options.metrics_port:
+            print(json.dumps(stats.snapshot(), indent=2))
+
+
+""" Supervisor """
+
+# how often a server process reports to the supervisor
+HEARTBEAT_INTERVAL = 1.0
+
+# a server process is not restarted sooner than this after it was last started, so a crash loop doesn't spin
+RESTART_DELAY = 1.0
+
+# give up when a server process dies this many times in a row without ever reporting, it is never going to come up
+MAX_FAILED_STARTS = 5
+
+
+# entry point of a server process run by the supervisor
+def run_server_process(options, pipe):
+    # the supervisor dumps and serves the combined metrics
+    options.metrics_port = options.metrics_interval = None
+    try:
+        asyncio.run(serve(options, pipe=pipe))
+    except KeyboardInterrupt:
+        pass
+
+
+# one server process and the pipe its heartbeats come in on
+class ServerProcess:
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.pipe = None
+        self.snapshot = None
+        self.started = self.last_seen = 0.0
+        self.failed_starts = 0
+
+    def start(self, context, options):
+        if self.pipe is not None:
+            self.pipe.close()
+        self.pipe, sender = context.Pipe(duplex=False)
+        self.process = context.Process(target=run_server_process, args=(options, sender),
+                                       name='server-%s' % self.index)
+        self.process.start()
+        sender.close()
+        self.snapshot = None
+        self.started = self.last_seen = time.monotonic()
+
+    # read every heartbeat that came in since last time, keeping the newest snapshot
+    def poll(self):
+        try:
+            while self.pipe.poll():
+                self.snapshot = self.pipe.recv()
+                self.last_seen = time.monotonic()
+                self.failed_starts = 0
+        except (EOFError, OSError):
+            pass
+
+
+# runs options.processes server processes on the same port, restarting any that exit or stop sending heartbeats,
+# and adds up their metrics
+class Supervisor:
+
+    def __init__(self, options):
+        self.options = options
+        # spawned rather than forked, a forked child would inherit the supervisor's running event loop
+        self.context = multiprocessing.get_context('spawn')
+        self.servers = [ServerProcess(index) for index in range(options.processes)]
+        self.started = time.time()
+        self.retired = None
+        self.restarts = 0
+
+    # metrics of every server process, including the ones that have since been restarted
+    def snapshot(self):
+        snapshots = [server.snapshot for server in self.servers if server.snapshot is not None]
+        if self.retired is not None:
+            snapshots.append(self.retired)
+        result = metrics.combine(snapshots, self.started)
+        result['processes'] = len(self.servers)
+        result['restarts'] = self.restarts
+        return result
+
+    # keep the last numbers of a server process that is being replaced
+    def retire(self, server):
+        server.poll()
+        if server.snapshot is not None:
+            # its connections and cache went with it, only the counts carry on
+            server.snapshot['open_connections'] = 0
+            if server.snapshot['cache'] is not None:
+                server.snapshot['cache']['size'] = server.snapshot['cache']['max_size'] = 0
+            if self.retired is not None:
+                server.snapshot = metrics.combine([self.retired, server.snapshot], self.started)
+            self.retired = server.snapshot
+            server.snapshot = None
+
+    # restart every server process that has exited or gone quiet, returning False once one keeps failing to start
+    def check(self):
+        now = time.monotonic()
+        for server in self.servers:
+            server.poll()
+            alive = server.process.is_alive()
+            if alive and now - server.last_seen <= self.options.health_timeout:
+                continue
+            if now - server.started < RESTART_DELAY:
+                continue
+            if alive:
+                server.process.kill()
+            server.process.join()
+            if server.snapshot is None:
+                server.failed_starts += 1
+                if server.failed_starts >= MAX_FAILED_STARTS:
+                    print('Server process %s failed to start %s times in a row, giving up'
+                          % (server.index, MAX_FAILED_STARTS))
+                    return False
+            if alive:
+                print('Server process %s sent nothing for %.1fs, restarting it'
+                      % (server.index, now - server.last_seen))
+            else:
+                print('Server process %s exited with code %s, restarting it' % (server.index, server.process.exitcode))
+            self.retire(server)
+            server.start(self.context, self.options)
+            self.restarts += 1
+        return True
+
+    # start the server processes and look after them until SIGINT/SIGTERM, then stop them all
+    # returns False if it had to give up on a server process that wouldn't start
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        for server in self.servers:
+            server.start(self.context, self.options)
+        print('Supervising %s server processes on port %s' % (len(self.servers), self.options.port))
+
+        reporters = []
+        if self.options.metrics_port:
+            reporters.append(await metrics.serve_http(self, self.options.metrics_port))
+            print('Serving metrics on port %s' % self.options.metrics_port)
+        dumper = None
+        if self.options.metrics_interval:
+            dumper = asyncio.ensure_future(metrics.dump_periodically(self, self.options.metrics_interval))
+
+        healthy = True
+        try:
+            while healthy and not stop.is_set():
+                try:
+                    await asyncio.wait_for(stop.wait(), HEARTBEAT_INTERVAL / 2)
+                except asyncio.TimeoutError:
+                    healthy = self.check()
+        finally:
+            # SIGTERM lets each server process finish its in-flight requests, as it would on its own
+            for server in self.servers:
+                if server.process.is_alive():
+                    server.process.terminate()
+            for server in self.servers:
+                await loop.run_in_executor(None, server.process.join, 10)
+                if server.process.is_alive():
+                    server.process.kill()
+                    server.process.join()
+                server.poll()
+            if dumper is not None:
+                dumper.cancel()
+            for reporter in reporters:
+                reporter.close()
+            if self.options.metrics_interval or self.options.metrics_port:
+                print(json.dumps(self.snapshot(), indent=2))
+        return healthy
 
 
 if __name__ == '__main__':
 
     parser = optparse.OptionParser()
     options = setup_optparser(parser)
-    
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    ip_address = 'localhost'
-    port = 9088
-    server.bind((ip_address, port))
-    print('Now serving on port %s' % port)
-    server.listen(1)
-    while True:
-        try:
-            print('\nAwaiting next message...')
-            conn, addr = server.accept()
-            received = conn.recv(2048)
-            received = received.decode('utf-8')
-            print(received)
-            received = received.split(',')
-            message = received[0]
-            error_type = received[1]
-            error_arg = received[2]
-            size = message.__len__()
-            message = make_switch(message, size)
-            print(message)
-            if error_type == "parity1d":
-                segmented_message = segment(message, 9)  # parity1d works in 8-bit segments with a parity bit appended to the end, so 9 bits per segment
-                error_checked_message = parity_1D(segmented_message, error_arg)
-                error_checked_message = unsegment(error_checked_message)
-                reply = compare_messages(message, error_checked_message)
-            elif error_type == "parity2d":
-                segmented_message = segment(message, 9)  # parity2d works in 8-bit segments with a parity bit appended to the end, including the 8-bit column parity segment, so 9 bits per segment
-                error_checked_message = parity_2D(segmented_message, error_arg)
-                error_checked_message = unsegment(error_checked_message)
-                reply = compare_messages(message, error_checked_message)
-            elif error_type == "crc":
-                error_checked_message = crc(message, error_arg)
-                reply = compare_messages(message, error_checked_message)
-            else:
-                segmented_message = segment(message, 8)
-                reply = checksum(segmented_message)
-            reply = reply.encode('utf-8')
-            conn.send(reply)
-        except KeyboardInterrupt:
-            conn.close()
-            server.close()
-            sys.exit()
-
-    conn.close()
-    server.close()
+    if options.processes < 1:
+        parser.error('--processes must be at least 1')
+
+    try:
+        if options.processes > 1:
+            if not hasattr(socket, 'SO_REUSEPORT'):
+                sys.exit('\nPROCESSES ARG ERROR: this platform has no SO_REUSEPORT to share the port with')
+            if not asyncio.run(Supervisor(options).run()):
+                sys.exit(1)
+        else:
+            asyncio.run(serve(options))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,181 @@
+# simulate.py
+"""
+    Detection-effectiveness simulator. Runs encode -> corrupt -> verify trials in memory, with no sockets, to measure
+    how often each check type catches the errors each error model produces:
+
+        python simulate.py -t parity1d:even parity2d:even crc:crc8 crc:crc32 checksum:16 -s 64 512
+                           -e single bernoulli:0.001 burst:8 fixed:2 -n 1000000 -P 4 --seed 1
+
+    Messages are encoded and verified with the same checks package the client and server use, and corrupted in place
+    with the fault.py models the server's --error-model uses. Trials are split into batches that run in parallel
+    across processes, each with its own seed, so results are reproducible.
+
+    The hamming and secded checks correct what they can in the received message. A corrupted message counts as
+    corrected (and detected) only if that gives back exactly what was sent, a miscorrection is an undetected error.
+"""
+
+import os, sys, json, time, random
+import argparse
+import concurrent.futures
+
+import checks
+import fault
+import protocol
+from bitbuffer import BitBuffer
+
+
+BATCH_SIZE = 20000
+
+
+# function sets up the argparser arguments for the simulator
+def setup_argparser(parser):
+    parser.add_argument('-t', '--types', nargs='+',
+                        default=['parity1d:even', 'parity2d:even', 'crc:crc8', 'crc:crc16-ccitt', 'crc:crc32',
+                                 'checksum:8', 'checksum:16'],
+                        help='Usage: -t or --types <type>:<arg> [...] check types to compare')
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[64, 512],
+                        help='Usage: -s or --sizes <bits> [...] message sizes, multiples of 8')
+    parser.add_argument('-e', '--error-models', nargs='+', dest='error_models',
+                        default=['single', 'bernoulli:0.001', 'burst:8', 'burst:33', 'fixed:2', 'fixed:3'],
+                        help='Usage: -e or --error-models <model>[:<param>] [...], the param being the bernoulli '
+                             'rate, the burst length or the fixed number of flips')
+    parser.add_argument('-n', '--trials', type=int, default=100000,
+                        help='Usage: -n or --trials <count> per check type, size and error model')
+    parser.add_argument('-P', '--processes', type=int, default=os.cpu_count() or 1,
+                        help='Usage: -P or --processes <count> to run batches in')
+    parser.add_argument('--seed', type=int, default=0, help='Usage: --seed <number> for reproducible runs')
+    parser.add_argument('-o', '--output', help='Usage: -o or --output <file.json> to write the results to')
+    args = parser.parse_args()
+    if any(bits <= 0 or bits % 8 for bits in args.sizes):
+        parser.error('sizes must be positive multiples of 8')
+    return args
+
+
+# split a <name>:<value> argument
+def split_spec(spec):
+    name, _, value = spec.partition(':')
+    return name, value
+
+
+# build the injector for an error model spec such as bernoulli:0.001
+def make_injector(spec, seed):
+    model, value = split_spec(spec)
+    if model == 'bernoulli':
+        return fault.make_injector(model, rate=float(value or 0.001), seed=seed)
+    if model == 'burst':
+        return fault.make_injector(model, length=int(value or 8), seed=seed)
+    if model == 'fixed':
+        return fault.make_injector(model, count=int(value or 1), seed=seed)
+    return fault.make_injector(model, seed=seed)
+
+
+# protect data (bytes) with a check type, returning the transmitted BitBuffer the way the client builds it
+def encode(error_type, error_arg, data):
+    return checks.get(error_type).encode(BitBuffer(data), error_arg)
+
+
+# run one batch of trials, returning counts of (trials, corrupted, detected, false alarms, flipped bits, corrected)
+def run_batch(job):
+    check, bits, model, trials, seed = job
+    error_type, error_arg = split_spec(check)
+    check = checks.get(error_type)
+    rng = random.Random(seed)
+    inject = make_injector(model, rng.getrandbits(64))
+
+    corrupted = detected = false_alarms = flipped_bits = corrected = 0
+    for _ in range(trials):
+        transmitted = check.encode(BitBuffer(rng.getrandbits(bits).to_bytes(bits // 8, 'big')), error_arg)
+        payload, num_bits = protocol.pack_bits(transmitted)
+        payload = bytearray(payload)
+        flipped = inject(payload, num_bits)
+        received = protocol.unpack_bits(payload, num_bits) if flipped else transmitted
+
+        verdict = check.verify(received, error_arg)
+        verified = verdict.verified
+        if flipped:
+            corrupted += 1
+            flipped_bits += flipped
+            if not verified:
+                detected += 1
+            elif verdict.corrected and received == transmitted:
+                detected += 1
+                corrected += 1
+        elif not verified:
+            false_alarms += 1
+    return trials, corrupted, detected, false_alarms, flipped_bits, corrected
+
+
+# split every (check, size, model) case into batches, run them across processes and total them up per case
+def simulate(checks, sizes, models, trials, processes, seed):
+    cases = [(check, bits, model) for check in checks for bits in sizes for model in models]
+    jobs = []
+    for index, (check, bits, model) in enumerate(cases):
+        for start in range(0, trials, BATCH_SIZE):
+            jobs.append((index, (check, bits, model, min(BATCH_SIZE, trials - start), hash((seed, index, start)))))
+
+    totals = [[0] * 6 for _ in cases]
+    if processes > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as pool:
+            outcomes = pool.map(run_batch, [job for index, job in jobs], chunksize=1)
+            for (index, job), outcome in zip(jobs, outcomes):
+                totals[index] = [a + b for a, b in zip(totals[index], outcome)]
+    else:
+        for index, job in jobs:
+            totals[index] = [a + b for a, b in zip(totals[index], run_batch(job))]
+
+    results = []
+    for (check, bits, model), totals_for_case in zip(cases, totals):
+        count, corrupted, detected, false_alarms, flipped_bits, corrected = totals_for_case
+        error_type, error_arg = split_spec(check)
+        results.append({
+            'type': error_type, 'arg': error_arg, 'bits': bits, 'error_model': model,
+            'trials': count, 'corrupted': corrupted, 'detected': detected, 'undetected': corrupted - detected,
+            'corrected': corrected,
+            'detection_probability': detected / corrupted if corrupted else None,
+            'mean_flipped_bits': flipped_bits / corrupted if corrupted else 0.0,
+            'false_alarms': false_alarms,
+        })
+    return results
+
+
+# print the results as a table
+def print_results(results):
+    print('{:<10} {:<12} {:>7} {:<16} {:>10} {:>10} {:>10} {:>10} {:>12}'.format(
+        'type', 'arg', 'bits', 'error model', 'corrupted', 'detected', 'undetected', 'corrected', 'P(detect)'))
+    for r in results:
+        probability = r['detection_probability']
+        print('{:<10} {:<12} {:>7} {:<16} {:>10} {:>10} {:>10} {:>10} {:>12}'.format(
+            r['type'], r['arg'], r['bits'], r['error_model'], r['corrupted'], r['detected'], r['undetected'],
+            r['corrected'], '-' if probability is None else '{:.6f}'.format(probability)))
+        if r['false_alarms']:
+            print('  {} uncorrupted messages failed verification'.format(r['false_alarms']))
+
+
+if __name__ == '__main__':
+
+    args = setup_argparser(argparse.ArgumentParser())
+
+    # check every argument up front rather than in the middle of a long run
+    for check in args.types:
+        error_type, error_arg = split_spec(check)
+        try:
+            encode(error_type, error_arg, b'\x00')
+        except ValueError as e:
+            sys.exit('\nTYPE ARG ERROR: {}: {}'.format(check, e))
+    for model in args.error_models:
+        try:
+            make_injector(model, 0)
+        except ValueError as e:
+            sys.exit('\nERROR MODEL ARG ERROR: {}: {}'.format(model, e))
+
+    start = time.perf_counter()
+    results = simulate(args.types, args.sizes, args.error_models, args.trials, args.processes, args.seed)
+    elapsed = time.perf_counter() - start
+
+    print_results(results)
+    total = sum(r['trials'] for r in results)
+    print('\n{} trials in {:.1f}s ({:.0f} trials/s)'.format(total, elapsed, total / elapsed))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'seed': args.seed, 'elapsed_s': elapsed, 'results': results}, output, indent=2)
@@ -0,0 +1,188 @@
+# streaming.py
+"""
+    Streaming encoders and verifiers for every check type, for data that doesn't fit in memory (large files, socket
+    streams). Data is fed in as byte chunks of any size with update(chunk), and only a running state is kept:
+
+        crc       the crc register
+        checksum  the running one's complement sum, plus the bytes of a word split across two chunks
+        parity1d  nothing, the row parity bits of each chunk are handed back as it is fed in
+        parity2d  the XOR of every row so far (column parity) and the parity of the row parity bits
+
+    update(chunk) returns the check bits the chunk produced, one byte of 0 or 1 per data byte for parity and b'' for
+    the others. finalize() returns the trailing code as an int of width bits (0 bits for parity1d). Every data byte is
+    one 8 bit segment, and the results match the crc_engine, checksum_engine and parity_engine functions on the whole
+    message.
+
+    A file can be protected from the command line: python streaming.py -t crc crc32 big.bin
+"""
+
+import sys, argparse
+
+import checksum_engine
+import crc_engine
+import parity_engine
+
+
+CHUNK_SIZE = 1 << 20
+
+
+# running crc register
+class CRCEncoder:
+
+    def __init__(self, polynomial):
+        self.polynomial = polynomial
+        self.width = crc_engine.crc_width(polynomial)
+        self.register = 0
+
+    def update(self, chunk):
+        self.register = crc_engine.crc_update(self.register, chunk, self.polynomial)
+        return b''
+
+    def finalize(self):
+        return crc_engine.crc_finish(self.register, self.polynomial)
+
+
+# running one's complement sum over size bit words
+class ChecksumEncoder:
+
+    def __init__(self, size=8):
+        self.width = checksum_engine.word_size(size)
+        self.word_bytes = self.width // 8
+        self.total = 0
+        self.leftover = b''
+
+    def update(self, chunk):
+        # whole words are summed right away, any partial word at the end waits for the next chunk
+        data = self.leftover + bytes(chunk) if self.leftover else chunk
+        whole = len(data) - len(data) % self.word_bytes
+        self.leftover = bytes(data[whole:])
+        if whole:
+            words = checksum_engine.fold(int.from_bytes(data[:whole], 'big'), self.width)
+            self.total = checksum_engine.fold(self.total + words, self.width)
+        return b''
+
+    def finalize(self):
+        total = self.total
+        if self.leftover:
+            total = checksum_engine.fold(total + checksum_engine.ones_complement_sum(self.leftover, self.width),
+                                         self.width)
+        return ~total & ((1 << self.width) - 1)
+
+
+# row parity bit of every byte, handed back as each chunk is fed in
+class Parity1DEncoder:
+
+    width = 0
+
+    def __init__(self, schema):
+        self.table = parity_engine.schema_table(schema)
+
+    def update(self, chunk):
+        return bytes(chunk).translate(self.table)
+
+    def finalize(self):
+        return 0
+
+
+# row parity bits as in Parity1DEncoder, plus the 9 bit column parity segment once the data is done
+class Parity2DEncoder(Parity1DEncoder):
+
+    width = 9
+
+    def __init__(self, schema):
+        super().__init__(schema)
+        self.columns = 0
+        self.row_parity = 0
+
+    def update(self, chunk):
+        row_bits = super().update(chunk)
+        self.columns ^= parity_engine.xor_fold(chunk)
+        self.row_parity ^= row_bits.count(1) & 1
+        return row_bits
+
+    def finalize(self):
+        columns = (self.columns << 1) | self.row_parity
+        if self.table is parity_engine.ODD_TABLE:
+            columns ^= 0x1FF
+        return columns
+
+
+ENCODERS = {
+    'parity1d': Parity1DEncoder,
+    'parity2d': Parity2DEncoder,
+    'crc': CRCEncoder,
+    'checksum': ChecksumEncoder,
+}
+
+
+# build the streaming encoder for a check type and its arg, raising ValueError for unknown types or bad args
+def encoder(error_type, error_arg):
+    if error_type not in ENCODERS:
+        raise ValueError('check type must be one of %s, not %r' % (', '.join(ENCODERS), error_type))
+    return ENCODERS[error_type](error_arg)
+
+
+# checks received data against the check bits sent with it, a chunk at a time
+class Verifier:
+
+    def __init__(self, error_type, error_arg):
+        self.encoder = encoder(error_type, error_arg)
+        self.width = self.encoder.width
+        self.failed = False
+
+    # feed the next chunk of received data, with the row parity bits that came with it for the parity types
+    def update(self, chunk, received_bits=b''):
+        if self.encoder.update(chunk) != bytes(received_bits):
+            self.failed = True
+
+    # True if the data and every check bit arrived intact, given the trailing code that was received
+    def finalize(self, received_code=0):
+        return self.encoder.finalize() == received_code and not self.failed
+
+
+# run a readable binary stream through an encoder, reading into one reusable buffer, and return the trailing code
+# the row bits each chunk produces are handed to rows(row_bits) as they come rather than kept, memory stays the same
+# whatever the size of the stream
+def encode_stream(stream, coder, chunk_size=CHUNK_SIZE, rows=None):
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        read = stream.readinto(buffer)
+        if not read:
+            break
+        row_bits = coder.update(view[:read])
+        if rows is not None:
+            rows(row_bits)
+    return coder.finalize()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Print the error check code of a file, read a chunk at a time')
+    parser.add_argument('-t', '--type', type=str, nargs=2, required=True,
+                        help='Usage: -t or --type <typeOfErrorCheck> <option>')
+    parser.add_argument('file', help='file to protect, - for stdin')
+    args = parser.parse_args()
+
+    try:
+        coder = encoder(*args.type)
+    except ValueError as e:
+        sys.exit('\nTYPE ARG ERROR: {}'.format(e))
+
+    # only the number of rows and how many came out odd are printed, so that's all that is kept of the row bits
+    counts = [0, 0]
+
+    def count_rows(row_bits):
+        counts[0] += row_bits.count(1)
+        counts[1] += len(row_bits)
+
+    if args.file == '-':
+        code = encode_stream(sys.stdin.buffer, coder, rows=count_rows)
+    else:
+        with open(args.file, 'rb') as stream:
+            code = encode_stream(stream, coder, rows=count_rows)
+
+    if args.type[0] in ('parity1d', 'parity2d'):
+        print('row parity: {} of {} rows odd'.format(*counts))
+    if coder.width:
+        print('{0:0{1}b}'.format(code, coder.width))
@@ -0,0 +1,91 @@
+# tests/test_crc.py
+"""
+    crc_engine and the crc check against the original long division: the message with len(polynomial) - 1 zeros
+    appended, the polynomial XORed in under its leading 1 until the remainder is no wider than the zeros. Run with
+    python -m pytest.
+"""
+
+import random
+
+import pytest
+
+import checks
+import crc_engine
+from bitbuffer import BitBuffer
+
+
+# remainders narrower than, as wide as and wider than a byte, the presets, and polynomials with leading zeros
+POLYNOMIALS = ['11', '101', '1011', '10011', '110101', '1000011', '10001001', '100000111', '1100000001111',
+               '0101', '0011', '00111'] + [crc_engine.PRESETS[name] for name in crc_engine.PRESETS]
+
+
+# the original crc long division, returning the remainder as a binary string as wide as the polynomial's zeros
+def reference_crc(message, polynomial):
+    message = '{0:b}'.format(message)
+    zeros = '0' * (len(polynomial) - 1)
+    temp_message = message + zeros
+
+    # the divisor padded with trailing zeros to the length of the message, then shortened as the message shrinks
+    divisor = '{0:b}'.format(int(polynomial, 2))
+    divisor += '0' * (len(temp_message) - len(divisor))
+    temp_message = int(temp_message, 2)
+    divisor = int(divisor, 2)
+
+    remainder = ''
+    while True:
+        shift_amount = len('{0:b}'.format(divisor)) - len('{0:b}'.format(temp_message))
+        if shift_amount > 0:
+            divisor = divisor >> shift_amount
+        temp_message = temp_message ^ divisor
+        remainder = '{0:b}'.format(temp_message)
+        if len(remainder) <= len(zeros):
+            break
+    return remainder.rjust(len(zeros), '0')
+
+
+# every message of up to 10 bits, and random ones up to 300 bits
+# 0 is left out: the long division XORs the divisor into it even though there is nothing to divide, and gives a
+# remainder of 1 instead of 0 (see test_zero_message)
+def messages(seed):
+    generator = random.Random(seed)
+    return list(range(1, 1 << 10)) + [generator.getrandbits(generator.randint(1, 300)) | 1 for _ in range(200)]
+
+
+@pytest.mark.parametrize('polynomial', POLYNOMIALS)
+def test_remainder_matches_long_division(polynomial):
+    for message in messages(polynomial):
+        assert crc_engine.crc_code(message, polynomial) == reference_crc(message, polynomial)
+
+
+@pytest.mark.parametrize('polynomial', POLYNOMIALS)
+def test_zero_message(polynomial):
+    assert crc_engine.crc_remainder(0, polynomial) == 0
+
+
+@pytest.mark.parametrize('polynomial', POLYNOMIALS)
+def test_chunked_register_matches_whole_message(polynomial):
+    data = random.Random(polynomial).randbytes(257)
+    register = 0
+    for start in range(0, len(data), 10):
+        register = crc_engine.crc_update(register, data[start:start + 10], polynomial)
+    expected = reference_crc(int.from_bytes(data, 'big'), polynomial)
+    assert '{0:0{1}b}'.format(crc_engine.crc_finish(register, polynomial), len(expected)) == expected
+
+
+@pytest.mark.parametrize('polynomial', POLYNOMIALS)
+@pytest.mark.parametrize('length', [1, 2, 3, 7, 8, 9, 15, 16, 17, 33, 100])
+def test_check_appends_the_remainder_and_verifies(length, polynomial):
+    check = checks.get('crc')
+    generator = random.Random(length)
+    # leading zeros in the message bits are kept, they just don't change the remainder
+    message = generator.getrandbits(length) | 1
+    bits = '{0:0{1}b}'.format(message, length)
+    sent = check.encode(BitBuffer.from_string(bits), polynomial)
+    assert str(sent) == bits + reference_crc(message, polynomial)
+    assert check.verify(sent, polynomial).verified
+
+    # a single flipped bit is always caught by a polynomial with more than one term
+    for index in range(len(sent)):
+        flipped = sent[:]
+        flipped.flip(index)
+        assert not check.verify(flipped, polynomial).verified
@@ -0,0 +1,105 @@
+# tests/test_hamming.py
+"""
+    hamming_engine and the hamming and secded checks: encoding against a plain block-at-a-time version of the code,
+    every single flipped bit corrected, and for SECDED every two flipped bits in a block detected rather than
+    miscorrected. Run with python -m pytest.
+"""
+
+import random
+
+import pytest
+
+import checks
+import hamming_engine
+from bitbuffer import BitBuffer
+
+
+# lengths covering a lone short block, exact multiples of the block data size and messages spanning several chunks
+LENGTHS = [1, 2, 3, 4, 5, 11, 26, 57, 120, 121, 500]
+
+
+# a block at a time: the data bits, the r check bits that XOR together the columns of the set data bits (data bit i
+# having the i-th r bit column that isn't a power of two), then for SECDED the even parity bit of the whole block
+def reference_encode(bits, r, extended):
+    k = 2 ** r - 1 - r
+    columns = [column for column in range(1, 2 ** r) if column & (column - 1)]
+    blocks = []
+    for start in range(0, len(bits), k):
+        data = bits[start:start + k]
+        code = 0
+        for i, bit in enumerate(data):
+            if bit == '1':
+                code ^= columns[i]
+        block = data + '{0:0{1}b}'.format(code, r)
+        if extended:
+            block += str(block.count('1') % 2)
+        blocks.append(block)
+    return ''.join(blocks)
+
+
+def random_bits(length, seed):
+    generator = random.Random(seed)
+    return ''.join(generator.choice('01') for _ in range(length))
+
+
+@pytest.mark.parametrize('extended', [False, True])
+@pytest.mark.parametrize('r', [2, 3, 4, 5, 7, 10])
+@pytest.mark.parametrize('length', LENGTHS)
+def test_encode_matches_reference(length, r, extended):
+    bits = random_bits(length, '{} {}'.format(length, r))
+    assert str(hamming_engine.encode(BitBuffer.from_string(bits), r, extended)) == reference_encode(bits, r, extended)
+
+
+def test_encode_across_chunks():
+    # enough blocks for the bit-sliced encoder to work through several chunks, ending in a shortened block
+    bits = random_bits(3 * hamming_engine.CHUNK_BITS + 5, 'chunks')
+    assert str(hamming_engine.encode(BitBuffer.from_string(bits), 3, True)) == reference_encode(bits, 3, True)
+
+
+@pytest.mark.parametrize('error_type', ['hamming', 'secded'])
+@pytest.mark.parametrize('r', [2, 3, 4, 5])
+@pytest.mark.parametrize('length', LENGTHS[:-1])
+def test_every_single_flip_is_corrected(length, r, error_type):
+    check = checks.get(error_type)
+    sent = check.encode(BitBuffer.from_string(random_bits(length, '{} {}'.format(length, r))), r)
+    assert check.verify(sent[:], r).status == checks.RECEIVED
+    for index in range(len(sent)):
+        received = sent[:]
+        received.flip(index)
+        verdict = check.verify(received, r)
+        assert verdict.corrected and verdict.status == '{} 1 bit(s)'.format(checks.CORRECTED)
+        assert received == sent
+
+
+@pytest.mark.parametrize('error_type', ['hamming', 'secded'])
+def test_one_flip_in_every_block_is_corrected(error_type):
+    r = 4
+    check = checks.get(error_type)
+    sent = check.encode(BitBuffer.from_string(random_bits(2000, error_type)), r)
+    n = 2 ** r - 1 + (error_type == 'secded')
+    received = sent[:]
+    generator = random.Random(error_type)
+    blocks = range(0, len(sent), n)
+    for start in blocks:
+        received.flip(generator.randrange(start, min(start + n, len(sent))))
+    corrected, uncorrectable = hamming_engine.correct(received, r, error_type == 'secded')
+    assert (corrected, uncorrectable) == (len(blocks), 0)
+    assert received == sent
+
+
+@pytest.mark.parametrize('r', [2, 3, 4])
+@pytest.mark.parametrize('length', [1, 4, 11, 23, 40])
+def test_secded_detects_every_double_flip_in_a_block(length, r):
+    check = checks.get('secded')
+    sent = check.encode(BitBuffer.from_string(random_bits(length, '{} {}'.format(length, r))), r)
+    n = 2 ** r
+    for start in range(0, len(sent), n):
+        stop = min(start + n, len(sent))
+        for first in range(start, stop):
+            for second in range(first + 1, stop):
+                received = sent[:]
+                received.flip(first)
+                received.flip(second)
+                verdict = check.verify(received, r)
+                assert not verdict.verified
+                assert verdict.status.endswith('1 block(s) could not be corrected')
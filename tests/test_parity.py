@@ -0,0 +1,87 @@
+# tests/test_parity.py
+"""
+    parity_engine and the checks.parity checks against the original string implementation: 8 character segments of
+    the message, a parity bit appended to each, and for 2D parity a final segment with the parity of every column,
+    zip()-style, so it is only as wide as the shortest segment. Run with python -m pytest.
+"""
+
+import random
+
+import pytest
+
+import checks
+import parity_engine
+from bitbuffer import BitBuffer
+
+
+# bit lengths covering empty and one bit messages, every short final row length and a few longer messages
+LENGTHS = list(range(0, 42)) + [63, 64, 65, 71, 72, 73, 1000, 8 * parity_engine.ROW_CHUNK + 5]
+
+
+# the original parity bit of one segment string
+def reference_bit(segment, schema):
+    parity_count = segment.count('1')
+    if schema == 'even':
+        return str(parity_count % 2)
+    return str(1 - parity_count % 2)
+
+
+# the original 1D parity: the message cut into 8 bit segments, each with its parity bit appended
+def reference_1d(bits, schema):
+    return [segment + reference_bit(segment, schema) for segment in (bits[n:n + 8] for n in range(0, len(bits), 8))]
+
+
+# the original 2D parity: the 1D rows, then the parity of every column of them
+def reference_2d(bits, schema):
+    rows = reference_1d(bits, schema)
+    columns = [''.join(column) for column in zip(*rows)]
+    return rows + [''.join(reference_bit(column, schema) for column in columns)]
+
+
+# random message bits of the given length, plus the all 0 and all 1 messages
+def messages(length):
+    generator = random.Random(length)
+    return [''.join(generator.choice('01') for _ in range(length)), '0' * length, '1' * length]
+
+
+@pytest.mark.parametrize('schema', ['even', 'odd'])
+@pytest.mark.parametrize('length', LENGTHS)
+def test_parity_1d_matches_reference(length, schema):
+    for bits in messages(length):
+        expected = ''.join(reference_1d(bits, schema))
+        assert str(parity_engine.parity_1d(BitBuffer.from_string(bits), schema)) == expected
+        assert str(checks.get('parity1d').encode(BitBuffer.from_string(bits), schema)) == expected
+
+
+@pytest.mark.parametrize('schema', ['even', 'odd'])
+@pytest.mark.parametrize('length', LENGTHS)
+def test_parity_2d_matches_reference(length, schema):
+    for bits in messages(length):
+        expected = ''.join(reference_2d(bits, schema))
+        assert str(parity_engine.parity_2d(BitBuffer.from_string(bits), schema)) == expected
+        assert str(checks.get('parity2d').encode(BitBuffer.from_string(bits), schema)) == expected
+
+
+@pytest.mark.parametrize('schema', ['even', 'odd'])
+@pytest.mark.parametrize('length', LENGTHS)
+def test_strip_row_parity_gives_back_the_data(length, schema):
+    for bits in messages(length):
+        rows = BitBuffer.from_string(''.join(reference_1d(bits, schema)))
+        assert str(parity_engine.strip_row_parity(rows)) == bits
+
+
+@pytest.mark.parametrize('error_type', ['parity1d', 'parity2d'])
+@pytest.mark.parametrize('schema', ['even', 'odd'])
+@pytest.mark.parametrize('length', [n for n in LENGTHS if 0 < n <= 200])
+def test_verify_accepts_reference_messages_and_catches_a_flipped_bit(length, schema, error_type):
+    reference = reference_1d if error_type == 'parity1d' else reference_2d
+    check = checks.get(error_type)
+    for bits in messages(length):
+        sent = ''.join(reference(bits, schema))
+        assert check.verify(BitBuffer.from_string(sent), schema).verified
+
+        # a single flipped bit always changes the parity of its row (1D) or its column (2D)
+        for index in range(len(sent)):
+            flipped = BitBuffer.from_string(sent)
+            flipped.flip(index)
+            assert not check.verify(flipped, schema).verified